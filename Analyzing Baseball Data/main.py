@@ -1,4 +1,8 @@
 import csv
+import os
+import subprocess
+import sys
+from collections import namedtuple
 
 
 def read_csv_as_list_dict(filename, separator, quote):
@@ -20,6 +24,58 @@ def read_csv_as_list_dict(filename, separator, quote):
     return table
 
 
+def read_csv_as_dict_stream(filename, separator, quote, fields=None):
+    """
+    Inputs:
+      filename  - name of CSV file
+      separator - character that separates fields
+      quote     - character used to optionally quote fields
+      fields    - list of field names to keep, or None to keep all
+    Output:
+      Returns a generator that yields one dictionary per row of the CSV
+      file, reading the file lazily.  The dictionaries map the field
+      names (only those in fields, if given) to the field values for
+      that row.
+    """
+    with open(filename, newline='') as csvfile:
+        if fields is None:
+            yield from csv.DictReader(csvfile, delimiter=separator, quotechar=quote)
+            return
+        csvreader = csv.reader(csvfile, delimiter=separator, quotechar=quote)
+        header = next(csvreader, [])
+        positions = [(field, header.index(field)) for field in fields]
+        for row in csvreader:
+            if row:
+                yield {field: row[position] if position < len(row) else None
+                       for field, position in positions}
+
+
+def read_csv_as_tuple_stream(filename, separator, quote, fields=None, named=False):
+    """
+    Inputs:
+      filename  - name of CSV file
+      separator - character that separates fields
+      quote     - character used to optionally quote fields
+      fields    - list of field names to keep, or None to keep all
+      named     - if True, yield namedtuples instead of plain tuples
+    Output:
+      Returns a generator that yields one tuple per row of the CSV
+      file, reading the file lazily.  Each tuple holds the values of
+      fields (or of every field) in that order.  Field names that are
+      not valid identifiers are renamed positionally in namedtuples.
+    """
+    with open(filename, newline='') as csvfile:
+        csvreader = csv.reader(csvfile, delimiter=separator, quotechar=quote)
+        header = next(csvreader, [])
+        fields = header if fields is None else fields
+        positions = [header.index(field) for field in fields]
+        row_type = namedtuple("Row", fields, rename=True)._make if named else tuple
+        for row in csvreader:
+            if row:
+                yield row_type(row[position] if position < len(row) else None
+                               for position in positions)
+
+
 def read_csv_as_nested_dict(filename, keyfield, separator, quote):
     """
     Inputs:
@@ -111,14 +167,9 @@ def filter_by_year(statistics, year, yearid):
         if search.get(year) == yearid:
             # print(search)
             filter.append(search)
-    print(filter)
     return filter
 
 
-# read_csv_as_list_dict("batting1.csv",',','"')
-filter_by_year(read_csv_as_list_dict("batting1.csv", ',', '"'), "year", '2022')
-
-
 def top_player_ids(info, statistics, formula, numplayers):
     """
     Inputs:
@@ -265,7 +316,68 @@ def test_baseball_statistics():
         print(player)
     print("")
 
+
+def demo_filter_by_year():
+    """
+    Prints the rows of batting1.csv that are from 2022.
+    """
+    print(filter_by_year(read_csv_as_list_dict("batting1.csv", ',', '"'), "year", '2022'))
+
+
+def benchmark_import_time():
+    """
+    Output:
+      Imports this module in a fresh interpreter with -X importtime and
+      prints and returns a tuple of the cumulative import time of the
+      module in microseconds, the number of characters written to
+      stdout and the list of data files opened while importing it.
+
+    Action:
+      Raises AssertionError if importing the module opens a data file
+      or writes to stdout.
+    """
+    directory = os.path.dirname(os.path.abspath(__file__))
+    module = os.path.splitext(os.path.basename(__file__))[0]
+    probe = "\n".join([
+        "import contextlib, io, os, sys",
+        "opened = []",
+        "def audit(event, args):",
+        "    if (event == 'open' and isinstance(args[0], str)",
+        "            and not args[0].endswith(('.py', '.pyc'))):",
+        "        opened.append(os.path.basename(args[0]))",
+        "sys.addaudithook(audit)",
+        "output = io.StringIO()",
+        "with contextlib.redirect_stdout(output):",
+        "    import {}".format(module),
+        "print(len(output.getvalue()), *opened, sep='\\t')",
+    ])
+    completed = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", probe],
+        cwd=directory, capture_output=True, text=True, check=True)
+    cumulative = None
+    for line in completed.stderr.splitlines():
+        fields = line.split("|")
+        if len(fields) == 3 and fields[2].strip() == module:
+            cumulative = int(fields[1])
+    report = completed.stdout.rstrip("\n").split("\t")
+    printed = int(report[0])
+    opened = report[1:]
+    print("import {}: {} us cumulative, {} characters printed, "
+          "files opened: {}".format(module, cumulative, printed, opened))
+    assert not opened and not printed, "importing {} has side effects".format(module)
+    return cumulative, printed, opened
+
+
 # Make sure the following call to test_baseball_statistics is
 # commented out when submitting to OwlTest/CourseraTest.
 
 # test_baseball_statistics()
+
+# Uncomment to run the benchmarks.
+
+# benchmark_import_time()
+
+# Run the demo when this file is executed as a script.
+
+if __name__ == "__main__":
+    demo_filter_by_year()
@@ -7,6 +7,23 @@ about the expected behavior of the program.
 """
 
 import csv
+import heapq
+import os
+import random
+import struct
+import sys
+import tempfile
+import time
+import tracemalloc
+from array import array
+from collections import namedtuple
+from collections.abc import Mapping
+from operator import itemgetter
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
 
 
 def read_csv_as_list_dict(filename, separator, quote):
@@ -28,6 +45,58 @@ def read_csv_as_list_dict(filename, separator, quote):
     return table
 
 
+def read_csv_as_dict_stream(filename, separator, quote, fields=None):
+    """
+    Inputs:
+      filename  - name of CSV file
+      separator - character that separates fields
+      quote     - character used to optionally quote fields
+      fields    - list of field names to keep, or None to keep all
+    Output:
+      Returns a generator that yields one dictionary per row of the CSV
+      file, reading the file lazily.  The dictionaries map the field
+      names (only those in fields, if given) to the field values for
+      that row.
+    """
+    with open(filename, newline='') as csvfile:
+        if fields is None:
+            yield from csv.DictReader(csvfile, delimiter=separator, quotechar=quote)
+            return
+        csvreader = csv.reader(csvfile, delimiter=separator, quotechar=quote)
+        header = next(csvreader, [])
+        positions = [(field, header.index(field)) for field in fields]
+        for row in csvreader:
+            if row:
+                yield {field: row[position] if position < len(row) else None
+                       for field, position in positions}
+
+
+def read_csv_as_tuple_stream(filename, separator, quote, fields=None, named=False):
+    """
+    Inputs:
+      filename  - name of CSV file
+      separator - character that separates fields
+      quote     - character used to optionally quote fields
+      fields    - list of field names to keep, or None to keep all
+      named     - if True, yield namedtuples instead of plain tuples
+    Output:
+      Returns a generator that yields one tuple per row of the CSV
+      file, reading the file lazily.  Each tuple holds the values of
+      fields (or of every field) in that order.  Field names that are
+      not valid identifiers are renamed positionally in namedtuples.
+    """
+    with open(filename, newline='') as csvfile:
+        csvreader = csv.reader(csvfile, delimiter=separator, quotechar=quote)
+        header = next(csvreader, [])
+        fields = header if fields is None else fields
+        positions = [header.index(field) for field in fields]
+        row_type = namedtuple("Row", fields, rename=True)._make if named else tuple
+        for row in csvreader:
+            if row:
+                yield row_type(row[position] if position < len(row) else None
+                               for position in positions)
+
+
 def read_csv_as_nested_dict(filename, keyfield, separator, quote):
     """
     Inputs:
@@ -50,6 +119,544 @@ def read_csv_as_nested_dict(filename, keyfield, separator, quote):
     return table
 
 
+##
+## Cached datasets shared across queries
+##
+
+# Loaded tables keyed by file and load parameters
+_FILE_CACHE = {}
+
+
+def file_signature(filename):
+    """
+    Inputs:
+      filename - name of a file on disk
+    Output:
+      Returns a tuple (modification time in ns, size in bytes) that
+      changes whenever the contents of the file are replaced.
+    """
+    stat = os.stat(filename)
+    return stat.st_mtime_ns, stat.st_size
+
+
+def load_cached(key, filename, loader):
+    """
+    Inputs:
+      key      - hashable key identifying what is loaded from filename
+      filename - name of the file the loaded value is built from
+      loader   - function of no arguments that builds the value
+    Output:
+      Returns the value built by loader.  The value is built at most
+      once per version of filename; it is rebuilt when the modification
+      time or size of the file changes.
+    """
+    signature = file_signature(filename)
+    entry = _FILE_CACHE.get(key)
+    if entry is None or entry[0] != signature:
+        entry = (signature, loader())
+        _FILE_CACHE[key] = entry
+    return entry[1]
+
+
+def clear_cache():
+    """
+    Drops every cached dataset so the next query reloads from disk.
+    """
+    _FILE_CACHE.clear()
+
+
+class BattingDataset:
+    """
+    Batting statistics table parsed once from the batting CSV file
+    described by a baseball data information dictionary.
+    """
+
+    def __init__(self, info):
+        """
+        Inputs:
+          info - Baseball data information dictionary
+        """
+        self.filename = info["battingfile"]
+        self.playerid = info["playerid"]
+        self.yearid = info["yearid"]
+        self.rows = read_csv_as_list_dict(info["battingfile"], info["separator"], info["quote"])
+        self.by_year = index_by_year(self.rows, info["yearid"])
+        self._columns = None
+
+    def get_columns(self):
+        """
+        Output:
+          Returns the BattingColumns view of the table, building it on
+          first use.  Requires NumPy.
+        """
+        if self._columns is None:
+            self._columns = BattingColumns(self.rows, self.playerid, self.yearid)
+        return self._columns
+
+    def rows_for_year(self, year):
+        """
+        Inputs:
+          year - Year to filter by
+        Output:
+          Returns the list of batting statistics dictionaries from the
+          input year, in file order.
+        """
+        return self.by_year.get(str(year), [])
+
+    def rows_for_years(self, first_year, last_year):
+        """
+        Inputs:
+          first_year - First year of the range
+          last_year  - Last year of the range (inclusive)
+        Output:
+          Returns the list of batting statistics dictionaries from the
+          years first_year through last_year, in year order.
+        """
+        return filter_by_year_range(self.by_year, first_year, last_year)
+
+
+def load_batting_dataset(info):
+    """
+    Inputs:
+      info - Baseball data information dictionary
+    Output:
+      Returns the BattingDataset for the batting file in info, parsing
+      the file only if it has not been loaded yet or has changed on disk
+      since it was loaded.
+    """
+    filename = info["battingfile"]
+    key = ("batting", os.path.abspath(filename), info["separator"], info["quote"],
+           info["playerid"], info["yearid"])
+    return load_cached(key, filename, lambda: BattingDataset(info))
+
+
+class BattingColumns:
+    """
+    Columnar form of a batting statistics table.  Player IDs are
+    interned into an integer index, rows are indexed by year string and
+    numeric fields are converted to float arrays the first time they are
+    requested.  Cells that are not numbers are stored as NaN and only
+    raise when a query reads them, so a bad row in one season does not
+    break queries about another.  Requires NumPy.
+    """
+
+    def __init__(self, rows, playerid, yearid=None):
+        """
+        Inputs:
+          rows     - List of batting statistics dictionaries
+          playerid - Player ID field name
+          yearid   - Year ID field name, or None to skip the year index
+        """
+        self._rows = rows
+        self._fields = {}
+        self._invalid = {}
+        self._totals = {}
+
+        # Intern player IDs in order of first appearance
+        self.player_ids = []
+        codes = {}
+        player_index = np.empty(len(rows), dtype=np.int32)
+        year_rows = {}
+        for row_id, row in enumerate(rows):
+            player = row[playerid]
+            code = codes.get(player)
+            if code is None:
+                code = codes[player] = len(self.player_ids)
+                self.player_ids.append(player)
+            player_index[row_id] = code
+            if yearid is None:
+                continue
+            year = row.get(yearid)
+            if year in year_rows:
+                year_rows[year].append(row_id)
+            else:
+                year_rows[year] = [row_id]
+        self.player_index = player_index
+        self.year_rows = {year: np.array(row_ids, dtype=np.intp)
+                          for year, row_ids in year_rows.items()}
+
+    def __len__(self):
+        return len(self._rows)
+
+    def __getitem__(self, field):
+        """
+        Returns the float array holding the values of field for every row.
+        """
+        column = self._fields.get(field)
+        if column is None:
+            try:
+                column = np.fromiter((float(row[field]) for row in self._rows),
+                                     dtype=np.float64, count=len(self._rows))
+            except (KeyError, TypeError, ValueError):
+                column = self._parse_column(field)
+            self._fields[field] = column
+        return column
+
+    def _parse_column(self, field):
+        """
+        Converts field cell by cell, storing NaN for the cells float()
+        rejects and recording their row IDs in self._invalid.
+        """
+        column = np.empty(len(self._rows), dtype=np.float64)
+        invalid = []
+        for row_id, row in enumerate(self._rows):
+            try:
+                column[row_id] = float(row[field])
+            except (KeyError, TypeError, ValueError):
+                column[row_id] = np.nan
+                invalid.append(row_id)
+        self._invalid[field] = np.array(invalid, dtype=np.intp)
+        return column
+
+    def check_rows(self, field, row_ids):
+        """
+        Inputs:
+          field   - Field name
+          row_ids - array of row IDs, or None for every row
+        Action:
+          Raises the error float() gives for the first of the rows whose
+          field value could not be converted, if there is one.
+        """
+        self[field]
+        invalid = self._invalid.get(field)
+        if invalid is None or not len(invalid):
+            return
+        if row_ids is not None:
+            invalid = row_ids[np.isin(row_ids, invalid)]
+        if len(invalid):
+            float(self._rows[int(invalid[0])][field])
+
+    def rows_for_year(self, year):
+        """
+        Inputs:
+          year - Year to filter by
+        Output:
+          Returns an array of the row IDs from the input year, in
+          file order.
+        """
+        return self.year_rows.get(str(year), np.empty(0, dtype=np.intp))
+
+    def rows_for_years(self, first_year, last_year):
+        """
+        Inputs:
+          first_year - First year of the range
+          last_year  - Last year of the range (inclusive)
+        Output:
+          Returns an array of the row IDs from the years first_year
+          through last_year, in year order.
+        """
+        parts = [self.rows_for_year(year) for year in range(int(first_year), int(last_year) + 1)]
+        return np.concatenate(parts) if parts else np.empty(0, dtype=np.intp)
+
+    def select(self, row_ids):
+        """
+        Inputs:
+          row_ids - array of row IDs
+        Output:
+          Returns a ColumnSelection restricted to the given rows.
+        """
+        return ColumnSelection(self, row_ids)
+
+    def player_totals(self, fields):
+        """
+        Inputs:
+          fields - List of fields to aggregate
+        Output:
+          Returns a PlayerTotals holding, for every player, the sum of
+          each field over all of the player's rows.
+        """
+        totals = {}
+        for field in fields:
+            total = self._totals.get(field)
+            if total is None:
+                self.check_rows(field, None)
+                # Rows are added in file order, as aggregate_by_player_id does
+                total = np.bincount(self.player_index, weights=self[field],
+                                    minlength=len(self.player_ids))
+                self._totals[field] = total
+            totals[field] = total
+        return PlayerTotals(self.player_ids, totals)
+
+
+class ColumnSelection:
+    """
+    The rows of a BattingColumns table with the given row IDs.  Indexing
+    by field name returns the float array of that field for those rows,
+    so vectorized formulas can be applied to it.
+    """
+
+    def __init__(self, columns, row_ids):
+        self._columns = columns
+        self._fields = {}
+        self.row_ids = row_ids
+
+    def __len__(self):
+        return len(self.row_ids)
+
+    def __getitem__(self, field):
+        # Gather each field once, however many formulas read it
+        column = self._fields.get(field)
+        if column is None:
+            self._columns.check_rows(field, self.row_ids)
+            column = self._fields[field] = self._columns[field][self.row_ids]
+        return column
+
+    def player_ids(self, positions):
+        """
+        Inputs:
+          positions - array of positions within the selection
+        Output:
+          Returns the list of player IDs of the rows at those positions.
+        """
+        ids = self._columns.player_ids
+        codes = self._columns.player_index[self.row_ids[positions]]
+        return [ids[code] for code in codes.tolist()]
+
+
+class PlayerTotals:
+    """
+    Per-player sums of batting statistics in columnar form: a list of
+    player IDs and one float array per aggregated field, aligned with
+    that list.
+    """
+
+    def __init__(self, players, totals):
+        """
+        Inputs:
+          players - List of player IDs in order of first appearance
+          totals  - Dictionary mapping field names to arrays of sums
+        """
+        self.players = players
+        self.totals = totals
+
+    def __len__(self):
+        return len(self.players)
+
+    def __getitem__(self, field):
+        return self.totals[field]
+
+    def player_ids(self, positions):
+        """
+        Inputs:
+          positions - array of positions within the totals
+        Output:
+          Returns the list of player IDs at those positions.
+        """
+        return [self.players[position] for position in positions.tolist()]
+
+    def to_dict(self, playerid):
+        """
+        Inputs:
+          playerid - Player ID field name
+        Output:
+          Returns the nested dictionary produced by aggregate_by_player_id
+          for the same statistics.
+        """
+        result = {}
+        columns = [(field, total.tolist()) for field, total in self.totals.items()]
+        for position, player in enumerate(self.players):
+            player_stats = {playerid: player}
+            for field, values in columns:
+                player_stats[field] = values[position]
+            result[player] = player_stats
+        return result
+
+
+def read_player_names(info):
+    """
+    Inputs:
+      info - Baseball data information dictionary
+    Output:
+      Returns a dictionary mapping each player ID in the master file
+      to the string "FirstName LastName".
+    """
+    playerid = info['playerid']
+    firstname = info['firstname']
+    lastname = info['lastname']
+
+    player_names = {}
+    with open(info['masterfile'], 'r', newline='') as csvfile:
+        reader = csv.DictReader(csvfile, delimiter=info['separator'], quotechar=info['quote'])
+        for row in reader:
+            player_names[row[playerid]] = row[firstname] + ' ' + row[lastname]
+    return player_names
+
+
+# Header of a saved player name index: magic, master file mtime (ns),
+# master file size and number of entries
+PLAYER_INDEX_MAGIC = b"PNIDX001"
+PLAYER_INDEX_HEADER = struct.Struct("<8sqqQ")
+
+
+class PlayerNameIndex(Mapping):
+    """
+    Read-only mapping from player ID to "FirstName LastName".  Entries
+    are kept sorted by player ID in one byte buffer, each entry being
+    the UTF-8 player ID, a NUL byte and the UTF-8 name, with an array
+    of offsets marking where each entry starts.  Lookups are binary
+    searches over the offsets.
+    """
+
+    def __init__(self, offsets, data, signature=None):
+        """
+        Inputs:
+          offsets   - array of len(entries) + 1 entry start offsets
+          data      - bytes holding the concatenated entries
+          signature - file_signature of the master file the index was
+                      built from, or None if unknown
+        """
+        self._offsets = offsets
+        self._data = data
+        self.signature = signature
+
+    @classmethod
+    def from_mapping(cls, player_names, signature=None):
+        """
+        Inputs:
+          player_names - dictionary mapping player IDs to names
+          signature    - file_signature of the source master file
+        Output:
+          Returns a PlayerNameIndex holding the same entries.
+        """
+        entries = sorted((playerid.encode('utf-8'), name.encode('utf-8'))
+                         for playerid, name in player_names.items())
+        offsets = array('Q', [0])
+        chunks = []
+        position = 0
+        for playerid, name in entries:
+            chunks.append(playerid + b"\0" + name)
+            position += len(playerid) + 1 + len(name)
+            offsets.append(position)
+        return cls(offsets, b"".join(chunks), signature)
+
+    @classmethod
+    def load(cls, filename):
+        """
+        Inputs:
+          filename - name of a file written by PlayerNameIndex.save
+        Output:
+          Returns the PlayerNameIndex stored in the file.  Raises
+          ValueError if the file is not a complete index file.
+        """
+        with open(filename, 'rb') as indexfile:
+            buffer = indexfile.read()
+        if len(buffer) < PLAYER_INDEX_HEADER.size:
+            raise ValueError("{} is not a player name index file".format(filename))
+        magic, mtime, size, count = PLAYER_INDEX_HEADER.unpack_from(buffer)
+        if magic != PLAYER_INDEX_MAGIC:
+            raise ValueError("{} is not a player name index file".format(filename))
+        start = PLAYER_INDEX_HEADER.size
+        end = start + 8 * (count + 1)
+        if end > len(buffer):
+            raise ValueError("{} is truncated".format(filename))
+        offsets = array('Q')
+        offsets.frombytes(buffer[start:end])
+        if sys.byteorder == 'big':
+            offsets.byteswap()
+        if offsets[0] != 0 or offsets[-1] != len(buffer) - end:
+            raise ValueError("{} is truncated".format(filename))
+        return cls(offsets, buffer[end:], (mtime, size))
+
+    def save(self, filename):
+        """
+        Inputs:
+          filename - name of file to write
+        Output:
+          Writes the index to filename in the format read by load.  The
+          index is written to a temporary file that then replaces
+          filename, so readers never see a partly written index.
+        """
+        mtime, size = self.signature if self.signature is not None else (0, 0)
+        offsets = array('Q', self._offsets)
+        if sys.byteorder == 'big':
+            offsets.byteswap()
+        descriptor, temporary = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(filename)),
+                                                 suffix=".tmp")
+        try:
+            with os.fdopen(descriptor, 'wb') as indexfile:
+                indexfile.write(PLAYER_INDEX_HEADER.pack(PLAYER_INDEX_MAGIC, mtime, size, len(self)))
+                indexfile.write(offsets.tobytes())
+                indexfile.write(self._data)
+            os.replace(temporary, filename)
+        except BaseException:
+            os.remove(temporary)
+            raise
+
+    def _entry(self, index):
+        """
+        Returns the (player ID, name) byte strings of entry number index.
+        """
+        entry = self._data[self._offsets[index]:self._offsets[index + 1]]
+        playerid, _, name = entry.partition(b"\0")
+        return playerid, name
+
+    def __getitem__(self, playerid):
+        key = playerid.encode('utf-8')
+        low, high = 0, len(self)
+        while low < high:
+            middle = (low + high) // 2
+            if self._entry(middle)[0] < key:
+                low = middle + 1
+            else:
+                high = middle
+        if low < len(self):
+            entry_id, name = self._entry(low)
+            if entry_id == key:
+                return name.decode('utf-8')
+        raise KeyError(playerid)
+
+    def __iter__(self):
+        for index in range(len(self)):
+            yield self._entry(index)[0].decode('utf-8')
+
+    def __len__(self):
+        return len(self._offsets) - 1
+
+
+def build_player_name_index(info):
+    """
+    Inputs:
+      info - Baseball data information dictionary.  If it has a
+             "masterindex" entry, that file is used as an on-disk
+             PlayerNameIndex for the master file.
+    Output:
+      Returns a mapping from player ID to "FirstName LastName".  When
+      info has a "masterindex" file that was built from the current
+      master file, it is loaded without parsing the CSV; otherwise the
+      CSV is parsed and, if "masterindex" is given, the index file is
+      (re)written.  An index file that cannot be loaded is treated as
+      stale.
+    """
+    indexfile = info.get('masterindex')
+    if indexfile is None:
+        return read_player_names(info)
+
+    signature = file_signature(info['masterfile'])
+    try:
+        index = PlayerNameIndex.load(indexfile)
+    except (OSError, ValueError):
+        index = None
+    if index is not None and index.signature == signature:
+        return index
+    index = PlayerNameIndex.from_mapping(read_player_names(info), signature)
+    index.save(indexfile)
+    return index
+
+
+def load_player_names(info):
+    """
+    Inputs:
+      info - Baseball data information dictionary
+    Output:
+      Returns the player ID to name mapping for the master file in
+      info, built at most once per version of the master file.
+    """
+    filename = info['masterfile']
+    key = ("players", os.path.abspath(filename), info['separator'], info['quote'],
+           info['playerid'], info['firstname'], info['lastname'], info.get('masterindex'))
+    return load_cached(key, filename, lambda: build_player_name_index(info))
+
+
 ##
 ## Provided formulas for common batting statistics
 ##
@@ -108,6 +715,147 @@ def slugging_percentage(info, batting_stats):
         return 0
 
 
+def onbase_plus_slugging(info, batting_stats):
+    """
+    Inputs:
+      batting_stats - dictionary of batting statistics (values are strings)
+    Output:
+      Returns the on-base plus slugging percentage as a float
+    """
+    return onbase_percentage(info, batting_stats) + slugging_percentage(info, batting_stats)
+
+
+##
+## Vectorized formulas over columns of batting statistics
+##
+
+def batting_average_columns(info, columns):
+    """
+    Inputs:
+      columns - mapping from field names to float arrays of batting
+                statistics, such as a ColumnSelection
+    Output:
+      Returns an array of batting averages, 0 where at bats are below
+      MINIMUM_AB
+    """
+    hits = columns[info["hits"]]
+    at_bats = columns[info["atbats"]]
+    qualified = at_bats >= MINIMUM_AB
+    return np.divide(hits, at_bats, out=np.zeros(len(at_bats)), where=qualified)
+
+
+def onbase_percentage_columns(info, columns):
+    """
+    Inputs:
+      columns - mapping from field names to float arrays of batting
+                statistics, such as a ColumnSelection
+    Output:
+      Returns an array of on-base percentages, 0 where at bats are below
+      MINIMUM_AB
+    """
+    hits = columns[info["hits"]]
+    at_bats = columns[info["atbats"]]
+    walks = columns[info["walks"]]
+    qualified = at_bats >= MINIMUM_AB
+    return np.divide(hits + walks, at_bats + walks, out=np.zeros(len(at_bats)), where=qualified)
+
+
+def slugging_percentage_columns(info, columns):
+    """
+    Inputs:
+      columns - mapping from field names to float arrays of batting
+                statistics, such as a ColumnSelection
+    Output:
+      Returns an array of slugging percentages, 0 where at bats are below
+      MINIMUM_AB
+    """
+    hits = columns[info["hits"]]
+    doubles = columns[info["doubles"]]
+    triples = columns[info["triples"]]
+    home_runs = columns[info["homeruns"]]
+    singles = hits - doubles - triples - home_runs
+    at_bats = columns[info["atbats"]]
+    qualified = at_bats >= MINIMUM_AB
+    total_bases = singles + 2 * doubles + 3 * triples + 4 * home_runs
+    return np.divide(total_bases, at_bats, out=np.zeros(len(at_bats)), where=qualified)
+
+
+def onbase_plus_slugging_columns(info, columns):
+    """
+    Inputs:
+      columns - mapping from field names to float arrays of batting
+                statistics, such as a ColumnSelection
+    Output:
+      Returns an array of on-base plus slugging percentages, 0 where at
+      bats are below MINIMUM_AB
+    """
+    return onbase_percentage_columns(info, columns) + slugging_percentage_columns(info, columns)
+
+
+# Vectorized equivalents of the per-row formulas.  Other formulas, such
+# as lambdas, are evaluated one row at a time.
+VECTORIZED_FORMULAS = {batting_average: batting_average_columns,
+                       onbase_percentage: onbase_percentage_columns,
+                       slugging_percentage: slugging_percentage_columns,
+                       onbase_plus_slugging: onbase_plus_slugging_columns}
+
+
+def vectorized_formula(formula):
+    """
+    Inputs:
+      formula - function that takes an info dictionary and a batting
+                statistics dictionary as input
+    Output:
+      Returns the vectorized equivalent of formula, or None if there is
+      none or NumPy is not available.
+    """
+    if np is None:
+        return None
+    return VECTORIZED_FORMULAS.get(formula)
+
+
+def top_indices(values, numplayers):
+    """
+    Inputs:
+      values     - array of compound statistics
+      numplayers - Number of top values to return
+    Output:
+      Returns an array of the positions of the numplayers largest values,
+      in decreasing order of value.  Equal values keep their positional
+      order, matching select_top_pairs.
+    """
+    if numplayers <= 0:
+        return np.empty(0, dtype=np.intp)
+    if numplayers < len(values):
+        # Only values at least as large as the numplayers-th largest can
+        # be in the result
+        kth = len(values) - numplayers
+        threshold = np.partition(values, kth)[kth]
+        candidates = np.flatnonzero(values >= threshold)
+    else:
+        candidates = np.arange(len(values))
+    order = np.argsort(-values[candidates], kind='stable')
+    return candidates[order[:numplayers]]
+
+
+def top_player_ids_columns(info, selection, formula, numplayers):
+    """
+    Inputs:
+      info       - Baseball data information dictionary
+      selection  - ColumnSelection or PlayerTotals of batting statistics
+      formula    - vectorized formula that takes an info dictionary and
+                   a ColumnSelection or PlayerTotals and returns an
+                   array of compound statistics
+      numplayers - Number of top players to return
+    Outputs:
+      Returns the same list of (player ID, compound statistic) tuples as
+      top_player_ids on the corresponding rows or aggregated stats.
+    """
+    values = formula(info, selection)
+    best = top_indices(values, numplayers)
+    return list(zip(selection.player_ids(best), values[best].tolist()))
+
+
 ##
 ## Part 1: Functions to compute top batting statistics by year
 ##
@@ -115,17 +863,52 @@ def slugging_percentage(info, batting_stats):
 def filter_by_year(statistics, year, yearid):
     """
     Inputs:
-      statistics - List of batting statistics dictionaries
+      statistics - List of batting statistics dictionaries, or any
+                   iterable of them such as read_csv_as_dict_stream
       year       - Year to filter by
       yearid     - Year ID field in statistics
     Outputs:
       Returns a list of batting statistics dictionaries that
-      are from the input year.
+      are from the input year.  Rows are consumed one at a time, so a
+      stream only needs memory for the rows that are kept.
     """
-    result = []
+    year = str(year)
+    return [stats for stats in statistics if stats.get(yearid) == year]
+
+
+def index_by_year(statistics, yearid):
+    """
+    Inputs:
+      statistics - List of batting statistics dictionaries
+      yearid     - Year ID field in statistics
+    Outputs:
+      Returns a dictionary mapping each year string found in statistics
+      to the list of batting statistics dictionaries from that year, in
+      their original order.
+    """
+    index = {}
     for stats in statistics:
-        if stats.get(yearid) == str(year):
-            result.append(stats)
+        year = stats.get(yearid)
+        if year in index:
+            index[year].append(stats)
+        else:
+            index[year] = [stats]
+    return index
+
+
+def filter_by_year_range(year_index, first_year, last_year):
+    """
+    Inputs:
+      year_index - Dictionary returned by index_by_year
+      first_year - First year of the range
+      last_year  - Last year of the range (inclusive)
+    Outputs:
+      Returns a list of batting statistics dictionaries from the years
+      first_year through last_year, in year order.
+    """
+    result = []
+    for year in range(int(first_year), int(last_year) + 1):
+        result.extend(year_index.get(str(year), []))
     return result
 
 
@@ -143,12 +926,26 @@ def top_player_ids(info, statistics, formula, numplayers):
       computed by formula, of the top numplayers players sorted in
       decreasing order of the computed statistic.
     """
-    # Compute the compound statistic for each player
-    player_stats = [(stats[info["playerid"]], formula(info, stats)) for stats in statistics]
-    # Sort the list of players by the compound statistic in decreasing order
-    sorted_players = sorted(player_stats, key=lambda x: x[1], reverse=True)
-    # Return the top numplayers players
-    return sorted_players[:numplayers]
+    # Compute the compound statistic for each player as it is consumed
+    playerid = info["playerid"]
+    player_stats = ((stats[playerid], formula(info, stats)) for stats in statistics)
+    # Keep only the top numplayers players
+    return select_top_pairs(player_stats, numplayers)
+
+
+def select_top_pairs(pairs, numplayers):
+    """
+    Inputs:
+      pairs      - iterable of (player ID, compound statistic) tuples
+      numplayers - Number of top pairs to return
+    Outputs:
+      Returns a list of the numplayers pairs with the largest statistic,
+      sorted in decreasing order of the statistic.  Only numplayers
+      pairs are held at a time.  Pairs with equal statistics keep the
+      order in which they were produced, so the result is the same as
+      sorting all pairs in decreasing order and slicing.
+    """
+    return heapq.nlargest(numplayers, pairs, key=itemgetter(1))
 
 
 def lookup_player_names(info, top_ids_and_stats):
@@ -163,16 +960,7 @@ def lookup_player_names(info, top_ids_and_stats):
       the input and "FirstName LastName" is the name of the player
       corresponding to the player ID in the input.
     """
-    playerfile = info['masterfile']
-    playerid = info['playerid']
-    firstname = info['firstname']
-    lastname = info['lastname']
-
-    player_names = {}
-    with open(playerfile, 'r', newline='') as csvfile:
-        reader = csv.DictReader(csvfile, delimiter=info['separator'], quotechar=info['quote'])
-        for row in reader:
-            player_names[row[playerid]] = row[firstname] + ' ' + row[lastname]
+    player_names = load_player_names(info)
 
     top_player_stats = []
     for player_stat in top_ids_and_stats:
@@ -197,16 +985,50 @@ def compute_top_stats_year(info, formula, numplayers, year):
       Returns a list of strings for the top numplayers in the given year
       according to the given formula.
     """
-    # Filter the statistics list to include only players from the given year
-    statistic = read_csv_as_list_dict(info["battingfile"], info["separator"], info["quote"])
-    year_stats = filter_by_year(statistic, year, info["yearid"])
-    # Compute the top numplayers players for the given year according to the formula
-    top_players = top_player_ids(info, year_stats, formula, numplayers)
+    dataset = load_batting_dataset(info)
+    vectorized = vectorized_formula(formula)
+    if vectorized is not None:
+        # Evaluate the formula over the whole season at once
+        columns = dataset.get_columns()
+        year_stats = columns.select(columns.rows_for_year(year))
+        top_players = top_player_ids_columns(info, year_stats, vectorized, numplayers)
+    else:
+        # Look up the statistics of players from the given year
+        year_stats = dataset.rows_for_year(year)
+        # Compute the top numplayers players for the given year according to the formula
+        top_players = top_player_ids(info, year_stats, formula, numplayers)
     # Lookup the names of the top players and format them as strings
     top_player_strings = lookup_player_names(info, top_players)
     return top_player_strings
 
 
+def compute_top_stats_year_range(info, formula, numplayers, first_year, last_year):
+    """
+    Inputs:
+      info        - Baseball data information dictionary
+      formula     - function that takes an info dictionary and a
+                    batting statistics dictionary as input and
+                    computes a compound statistic
+      numplayers  - Number of top players to return
+      first_year  - First year of the range
+      last_year   - Last year of the range (inclusive)
+    Outputs:
+      Returns a list of strings for the top numplayers single-season
+      statistics from the years first_year through last_year according
+      to the given formula.
+    """
+    dataset = load_batting_dataset(info)
+    vectorized = vectorized_formula(formula)
+    if vectorized is not None:
+        columns = dataset.get_columns()
+        range_stats = columns.select(columns.rows_for_years(first_year, last_year))
+        top_players = top_player_ids_columns(info, range_stats, vectorized, numplayers)
+    else:
+        range_stats = dataset.rows_for_years(first_year, last_year)
+        top_players = top_player_ids(info, range_stats, formula, numplayers)
+    return lookup_player_names(info, top_players)
+
+
 ##
 ## Part 2: Functions to compute top batting statistics by career
 ##
@@ -214,13 +1036,16 @@ def compute_top_stats_year(info, formula, numplayers, year):
 def aggregate_by_player_id(statistics, playerid, fields):
     """
     Inputs:
-      statistics - List of batting statistics dictionaries
+      statistics - List of batting statistics dictionaries, or any
+                   iterable of them such as read_csv_as_dict_stream
       playerid   - Player ID field name
       fields     - List of fields to aggregate
     Output:
       Returns a nested dictionary whose keys are player IDs and whose values
       are dictionaries of aggregated stats.  Only the fields from the fields
-      input will be aggregated in the aggregated stats dictionaries.
+      input will be aggregated in the aggregated stats dictionaries.  Rows
+      are consumed one at a time, so a stream only needs memory for the
+      aggregated stats.
     """
     result = {}
     for row in statistics:
@@ -234,6 +1059,25 @@ def aggregate_by_player_id(statistics, playerid, fields):
     return result
 
 
+def aggregate_by_player_id_columns(statistics, playerid, fields, nested=False):
+    """
+    Inputs:
+      statistics - List of batting statistics dictionaries
+      playerid   - Player ID field name
+      fields     - List of fields to aggregate
+      nested     - If True, return the nested dictionary produced by
+                   aggregate_by_player_id instead of a PlayerTotals
+    Output:
+      Returns a PlayerTotals with the sum of each field for each player,
+      computed by factorizing player IDs and summing typed columns with
+      a single bincount per field.  Requires NumPy.
+    """
+    totals = BattingColumns(statistics, playerid).player_totals(fields)
+    if nested:
+        return totals.to_dict(playerid)
+    return totals
+
+
 def compute_top_stats_career(info, formula, numplayers):
     """
     Inputs:
@@ -248,27 +1092,150 @@ def compute_top_stats_career(info, formula, numplayers):
       player ID. The list is sorted in decreasing order of the computed
       statistic.
     """
-    statistics = read_csv_as_list_dict(info['battingfile'], info['separator'], info['quote'])
+    dataset = load_batting_dataset(info)
+    vectorized = vectorized_formula(formula)
+    if vectorized is not None:
+        # Sum each field per player and evaluate the formula on all careers at once
+        totals = dataset.get_columns().player_totals(info['battingfields'])
+        top_stats = top_player_ids_columns(info, totals, vectorized, numplayers)
+        return lookup_player_names(info, top_stats)
 
     # Aggregate the stats by player ID
-    aggregated_stats = aggregate_by_player_id(statistics, info['playerid'], info['battingfields'])
+    aggregated_stats = aggregate_by_player_id(dataset.rows, info['playerid'], info['battingfields'])
+
+    # Compute the compound stats for each player and keep the top numplayers
+    compound_stats = ((playerid, formula(info, player_stats))
+                      for playerid, player_stats in aggregated_stats.items())
+    top_stats = select_top_pairs(compound_stats, numplayers)
+
+    # Format the results
+    return lookup_player_names(info, top_stats)
+
+
+##
+## Part 3: Leaderboards for several formulas in one pass
+##
+
+def parse_batting_fields(stats, fields, parsed=None):
+    """
+    Inputs:
+      stats  - batting statistics dictionary
+      fields - List of numeric fields
+      parsed - Dictionary to refill, or None to make a new one
+    Output:
+      Returns a copy of stats in which the given fields hold floats, so
+      that formulas sharing those fields do not parse them again.  When
+      parsed is given it is cleared and refilled instead, so one
+      dictionary can be reused across rows.
+    """
+    if parsed is None:
+        parsed = {}
+    else:
+        parsed.clear()
+    parsed.update(stats)
+    for field in fields:
+        parsed[field] = float(stats[field])
+    return parsed
+
+
+def top_player_ids_multi(info, statistics, formulas, numplayers):
+    """
+    Inputs:
+      info       - Baseball data information dictionary
+      statistics - List of batting statistics dictionaries
+      formulas   - List of formula functions
+      numplayers - Number of top players to return per formula
+    Outputs:
+      Returns a list holding, for each formula, the list top_player_ids
+      would return for it.  Each row is visited and parsed once for
+      all formulas, and only numplayers candidates are held per formula.
+    """
+    if numplayers <= 0:
+        return [[] for _ in formulas]
+    playerid = info["playerid"]
+    fields = info["battingfields"]
+    # Min-heaps of (statistic, -row number, player ID); on equal statistics
+    # the earlier row ranks higher, as in select_top_pairs
+    heaps = [[] for _ in formulas]
+    parsed = {}
+    for seq, stats in enumerate(statistics):
+        parse_batting_fields(stats, fields, parsed)
+        for formula, heap in zip(formulas, heaps):
+            entry = (formula(info, parsed), -seq, stats[playerid])
+            if len(heap) < numplayers:
+                heapq.heappush(heap, entry)
+            elif entry > heap[0]:
+                heapq.heapreplace(heap, entry)
+    return [[(player, stat) for stat, _, player in sorted(heap, reverse=True)]
+            for heap in heaps]
+
+
+def leaderboards(info, formulas, numplayers, statistics, selection):
+    """
+    Inputs:
+      info       - Baseball data information dictionary
+      formulas   - List of formula functions
+      numplayers - Number of top players to return per formula
+      statistics - function of no arguments returning the list of
+                   batting statistics dictionaries to rank
+      selection  - ColumnSelection or PlayerTotals of the same
+                   statistics, or None if NumPy is not available
+    Outputs:
+      Returns a list holding the top (player ID, statistic) tuples of
+      each formula.  Formulas with a vectorized equivalent are evaluated
+      on selection; the others share one pass over statistics.
+    """
+    result = [None] * len(formulas)
+    per_row = []
+    for position, formula in enumerate(formulas):
+        vectorized = vectorized_formula(formula)
+        if vectorized is not None and selection is not None:
+            result[position] = top_player_ids_columns(info, selection, vectorized, numplayers)
+        else:
+            per_row.append(position)
+    if per_row:
+        tops = top_player_ids_multi(info, statistics(), [formulas[position] for position in per_row],
+                                    numplayers)
+        for position, top in zip(per_row, tops):
+            result[position] = top
+    return result
 
-    # Compute the compound stats for each player
-    compound_stats = {}
-    for playerid in aggregated_stats:
-        player_stats = aggregated_stats[playerid]
-        compound_stats[playerid] = formula(info, player_stats)
 
-    # Sort the compound stats in decreasing order
-    sorted_stats = sorted(compound_stats.items(), key=lambda x: x[1], reverse=True)
+def compute_leaderboards(info, formulas, numplayers, years=(), career=False):
+    """
+    Inputs:
+      info        - Baseball data information dictionary
+      formulas    - List of functions that take an info dictionary and
+                    a batting statistics dictionary as input and compute
+                    a compound statistic
+      numplayers  - Number of top players to return per leaderboard
+      years       - Years to compute leaderboards for
+      career      - If True, also compute career leaderboards
+    Outputs:
+      Returns a dictionary mapping each year in years, and "career" if
+      career is True, to a list with one leaderboard per formula, in the
+      order of formulas.  Each leaderboard is the list of strings that
+      compute_top_stats_year or compute_top_stats_career returns.
+    """
+    dataset = load_batting_dataset(info)
+    use_columns = any(vectorized_formula(formula) is not None for formula in formulas)
+    columns = dataset.get_columns() if use_columns else None
+
+    top_stats = {}
+    for year in years:
+        selection = columns.select(columns.rows_for_year(year)) if use_columns else None
+        top_stats[year] = leaderboards(info, formulas, numplayers,
+                                       lambda year=year: dataset.rows_for_year(year), selection)
+    if career:
+        totals = columns.player_totals(info['battingfields']) if use_columns else None
+        top_stats["career"] = leaderboards(
+            info, formulas, numplayers,
+            lambda: aggregate_by_player_id(dataset.rows, info['playerid'],
+                                           info['battingfields']).values(),
+            totals)
 
-    # Get the top numplayers and format the results
-    top_players = []
-    for i in range(numplayers):
-        playerid, value = sorted_stats[i]
-        player_name = lookup_player_names(info, [(playerid, value)])
-        top_players.extend(player_name)
-    return top_players
+    return {key: [lookup_player_names(info, top) for top in tops]
+            for key, tops in top_stats.items()}
 
 
 def test_baseball_statistics():
@@ -337,9 +1304,218 @@ def test_baseball_statistics():
         print(player)
     print("")
 
+
+##
+## Benchmarks
+##
+
+def write_synthetic_baseball_files(directory, numplayers, numyears, seed=0):
+    """
+    Inputs:
+      directory  - directory in which to create the CSV files
+      numplayers - number of distinct players
+      numyears   - number of seasons, starting in 1900
+      seed       - seed for the random number generator
+    Output:
+      Writes a Lahman-style master and batting CSV file with one batting
+      row per player per season and returns the baseball data information
+      dictionary describing them.
+    """
+    rng = random.Random(seed)
+    fields = ["AB", "H", "2B", "3B", "HR", "BB"]
+    info = {"masterfile": os.path.join(directory, "Master_synthetic.csv"),
+            "battingfile": os.path.join(directory, "Batting_synthetic.csv"),
+            "separator": ",", "quote": '"',
+            "playerid": "playerID", "firstname": "nameFirst", "lastname": "nameLast",
+            "yearid": "yearID", "atbats": "AB", "hits": "H", "doubles": "2B",
+            "triples": "3B", "homeruns": "HR", "walks": "BB", "battingfields": fields}
+
+    with open(info["masterfile"], "w", newline='') as csvfile:
+        writer = csv.writer(csvfile)
+        writer.writerow(["playerID", "nameFirst", "nameLast"])
+        for player in range(numplayers):
+            writer.writerow(["player{:06d}".format(player), "First{}".format(player),
+                             "Last{}".format(player)])
+
+    with open(info["battingfile"], "w", newline='') as csvfile:
+        writer = csv.writer(csvfile)
+        writer.writerow(["playerID", "yearID"] + fields)
+        for year in range(1900, 1900 + numyears):
+            for player in range(numplayers):
+                at_bats = rng.randint(0, 700)
+                hits = rng.randint(0, at_bats // 3)
+                doubles = rng.randint(0, hits // 4)
+                triples = rng.randint(0, hits // 20)
+                home_runs = rng.randint(0, hits // 8)
+                walks = rng.randint(0, 120)
+                writer.writerow(["player{:06d}".format(player), year, at_bats, hits,
+                                 doubles, triples, home_runs, walks])
+    return info
+
+
+def benchmark_compute_top_stats_year(numplayers=1000, numyears=100, numqueries=20):
+    """
+    Inputs:
+      numplayers - number of players in the synthetic data set
+      numyears   - number of seasons in the synthetic data set
+      numqueries - number of year/formula queries to time
+    Output:
+      Prints and returns a dictionary with the mean per-query latency in
+      seconds of compute_top_stats_year when the batting file is parsed
+      for every query ("uncached") and when it is served from the cached
+      dataset ("cached").
+    """
+    formulas = [batting_average, onbase_percentage, slugging_percentage]
+    with tempfile.TemporaryDirectory() as directory:
+        info = write_synthetic_baseball_files(directory, numplayers, numyears)
+        queries = [(formulas[query % len(formulas)], 1900 + query % numyears)
+                   for query in range(numqueries)]
+
+        start = time.perf_counter()
+        for formula, year in queries:
+            clear_cache()
+            compute_top_stats_year(info, formula, 10, year)
+        uncached = (time.perf_counter() - start) / numqueries
+
+        clear_cache()
+        compute_top_stats_year(info, batting_average, 10, 1900)
+        start = time.perf_counter()
+        for formula, year in queries:
+            compute_top_stats_year(info, formula, 10, year)
+        cached = (time.perf_counter() - start) / numqueries
+        clear_cache()
+
+    results = {"uncached": uncached, "cached": cached}
+    print("compute_top_stats_year: {:.6f} s/query uncached, {:.6f} s/query cached".format(
+        uncached, cached))
+    return results
+
+
+def benchmark_select_top_pairs(numpairs=20000, sizes=(1, 10, 100, 1000), repeat=20):
+    """
+    Inputs:
+      numpairs - number of (player ID, statistic) pairs to select from
+      sizes    - numbers of top pairs to select
+      repeat   - number of times each selection is timed
+    Output:
+      Prints and returns a dictionary mapping each size to a tuple of
+      the mean time in seconds of a full sort followed by a slice and
+      of select_top_pairs.
+    """
+    rng = random.Random(0)
+    # Round the statistics so that the selection has to break ties
+    pairs = [("player{:06d}".format(index), round(rng.random(), 3))
+             for index in range(numpairs)]
+
+    results = {}
+    for size in sizes:
+        start = time.perf_counter()
+        for _ in range(repeat):
+            expected = sorted(pairs, key=itemgetter(1), reverse=True)[:size]
+        full_sort = (time.perf_counter() - start) / repeat
+
+        start = time.perf_counter()
+        for _ in range(repeat):
+            selected = select_top_pairs(iter(pairs), size)
+        heap = (time.perf_counter() - start) / repeat
+
+        assert selected == expected
+        results[size] = (full_sort, heap)
+        print("top {} of {}: {:.6f} s full sort, {:.6f} s heap".format(
+            size, numpairs, full_sort, heap))
+    return results
+
+
+def measure(function, *args):
+    """
+    Inputs:
+      function - function to call
+      args     - arguments to pass to function
+    Output:
+      Returns a tuple of the elapsed time in seconds of calling
+      function(*args) and the peak memory in bytes traced during a
+      second call.  The time is measured without tracing.
+    """
+    start = time.perf_counter()
+    function(*args)
+    elapsed = time.perf_counter() - start
+
+    tracemalloc.start()
+    function(*args)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return elapsed, peak
+
+
+def benchmark_aggregate_by_player_id(numplayers=5000, numyears=40):
+    """
+    Inputs:
+      numplayers - number of players in the synthetic data set
+      numyears   - number of seasons in the synthetic data set
+    Output:
+      Prints and returns a dictionary mapping each aggregation method to
+      a tuple of its time in seconds and peak traced memory in bytes.
+      "columns" includes building the typed columns from the rows.
+    """
+    with tempfile.TemporaryDirectory() as directory:
+        info = write_synthetic_baseball_files(directory, numplayers, numyears)
+        rows = read_csv_as_list_dict(info["battingfile"], info["separator"], info["quote"])
+    playerid = info["playerid"]
+    fields = info["battingfields"]
+
+    results = {"dict": measure(aggregate_by_player_id, rows, playerid, fields)}
+    if np is not None:
+        results["columns"] = measure(aggregate_by_player_id_columns, rows, playerid, fields)
+        results["columns, nested"] = measure(aggregate_by_player_id_columns,
+                                             rows, playerid, fields, True)
+    for method, (elapsed, peak) in results.items():
+        print("aggregate {} rows ({}): {:.6f} s, peak {:.1f} MiB".format(
+            len(rows), method, elapsed, peak / 2 ** 20))
+    return results
+
+
+def benchmark_streaming_aggregate(numplayers=1000, numyears=100):
+    """
+    Inputs:
+      numplayers - number of players in the synthetic data set
+      numyears   - number of seasons in the synthetic data set
+    Output:
+      Prints and returns a dictionary mapping each way of reading the
+      batting file to a tuple of the time in seconds and peak traced
+      memory in bytes of aggregating it by player ID.
+    """
+    with tempfile.TemporaryDirectory() as directory:
+        info = write_synthetic_baseball_files(directory, numplayers, numyears)
+        filename, separator, quote = info["battingfile"], info["separator"], info["quote"]
+        playerid = info["playerid"]
+        fields = info["battingfields"]
+
+        def aggregate_list():
+            rows = read_csv_as_list_dict(filename, separator, quote)
+            return aggregate_by_player_id(rows, playerid, fields)
+
+        def aggregate_stream():
+            rows = read_csv_as_dict_stream(filename, separator, quote, [playerid] + fields)
+            return aggregate_by_player_id(rows, playerid, fields)
+
+        results = {"list": measure(aggregate_list), "stream": measure(aggregate_stream)}
+
+    for method, (elapsed, peak) in results.items():
+        print("aggregate {} rows from a {}: {:.6f} s, peak {:.1f} MiB".format(
+            numplayers * numyears, method, elapsed, peak / 2 ** 20))
+    return results
+
+
 # print(
 # compute_top_stats_year({'masterfile': 'master2.csv', 'battingfile': 'batting2.csv', 'separator': ',', 'quote': '"',
 # 'playerid': 'playerID', 'firstname': 'nameFirst', 'lastname': 'nameLast', 'yearid': 'yearID',
 # 'atbats': 'AB', 'hits': 'H', 'doubles': '2B', 'triples': '3B', 'homeruns': 'HR', 'walks': 'BB',
 # 'battingfields': ['AB', 'H', '2B', '3B', 'HR', 'BB']},
-# batting_average, 5, 2006) )
\ No newline at end of file
+# batting_average, 5, 2006) )
+
+# Uncomment to run the benchmarks.
+
+# benchmark_compute_top_stats_year()
+# benchmark_select_top_pairs()
+# benchmark_aggregate_by_player_id()
+# benchmark_streaming_aggregate()
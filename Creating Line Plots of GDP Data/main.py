@@ -7,7 +7,17 @@ about the expected behavior of the program.
 """
 
 import csv
-import pygal
+import hashlib
+import os
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from collections import OrderedDict
+from collections.abc import Mapping
 
 
 def read_csv_as_nested_dict(filename, keyfield, separator, quote):
@@ -32,6 +42,126 @@ def read_csv_as_nested_dict(filename, keyfield, separator, quote):
             table[rowid] = row
     return table
 
+
+class CsvRow(Mapping):
+    """
+    Read-only row of a CSV file that shares one field name to position
+    mapping with every other row of the same file and stores only a
+    tuple of its own values.  Supports row[field], field in row, get,
+    keys, items and comparison with dictionaries.
+    """
+
+    __slots__ = ("_schema", "_values")
+
+    def __init__(self, schema, values):
+        """
+        Inputs:
+          schema - Dictionary mapping field names to positions in values
+          values - Tuple of field values
+        """
+        self._schema = schema
+        self._values = values
+
+    def __getitem__(self, field):
+        return self._values[self._schema[field]]
+
+    def __contains__(self, field):
+        return field in self._schema
+
+    def __iter__(self):
+        return iter(self._schema)
+
+    def __len__(self):
+        return len(self._schema)
+
+    def __repr__(self):
+        return "CsvRow({!r})".format(dict(self))
+
+
+def read_csv_as_compact_nested_dict(filename, keyfield, separator, quote):
+    """
+    Inputs:
+      filename  - Name of CSV file
+      keyfield  - Field to use as key for rows
+      separator - Character that separates fields
+      quote     - Character used to optionally quote fields
+
+    Output:
+      Returns the same dictionary as read_csv_as_nested_dict, except
+      that the rows are CsvRow objects sharing a single field mapping
+      instead of one dictionary per row.  As with csv.DictReader, missing
+      trailing values are None and values beyond the header are listed
+      under the key None.
+    """
+    table = {}
+    with open(filename, newline='') as csvfile:
+        csvreader = csv.reader(csvfile, delimiter=separator, quotechar=quote)
+        header = next(csvreader, [])
+        schema = {field: position for position, field in enumerate(header)}
+        width = len(header)
+        extra_schema = dict(schema)
+        extra_schema[None] = width
+        padding = (None,) * width
+        keyposition = schema[keyfield]
+        for row in csvreader:
+            if not row:
+                continue
+            if len(row) > width:
+                table[row[keyposition]] = CsvRow(extra_schema, tuple(row[:width]) + (row[width:],))
+                continue
+            values = tuple(row)
+            if len(values) < width:
+                values += padding[len(values):]
+            table[values[keyposition]] = CsvRow(schema, values)
+    return table
+
+
+# Parsed GDP tables keyed by file and load parameters
+_GDP_CACHE = {}
+
+
+def file_signature(filename):
+    """
+    Inputs:
+      filename - Name of a file on disk
+
+    Output:
+      Returns a tuple (modification time in ns, size in bytes) that
+      changes whenever the contents of the file are replaced.
+    """
+    stat = os.stat(filename)
+    return stat.st_mtime_ns, stat.st_size
+
+
+def load_gdp_table(gdpinfo):
+    """
+    Inputs:
+      gdpinfo - GDP data information dictionary
+
+    Output:
+      Returns the GDP table of the file described by gdpinfo as a
+      dictionary mapping country names to rows.  The file is parsed
+      once and the table is reused until the modification time or size
+      of the file changes.
+    """
+    filename = gdpinfo['gdpfile']
+    key = (os.path.abspath(filename), gdpinfo['country_name'], gdpinfo['separator'], gdpinfo['quote'])
+    signature = file_signature(filename)
+    entry = _GDP_CACHE.get(key)
+    if entry is None or entry[0] != signature:
+        table = read_csv_as_compact_nested_dict(filename, gdpinfo['country_name'],
+                                                gdpinfo['separator'], gdpinfo['quote'])
+        entry = _GDP_CACHE[key] = (signature, table)
+    return entry[1]
+
+
+def clear_gdp_cache():
+    """
+    Drops every cached GDP table so the next call reloads from disk.
+    """
+    _GDP_CACHE.clear()
+
+
 def build_plot_values(gdpinfo, gdpdata):
     """
     Inputs:
@@ -77,10 +207,9 @@ def build_plot_dict(gdpinfo, country_list):
       CSV file should still be in the output dictionary, but
       with an empty XY plot value list.
     """
+    gdp_data_dict = load_gdp_table(gdpinfo)
     result_dict = {}
     for country in country_list:
-        gdp_data_dict = read_csv_as_nested_dict(gdpinfo['gdpfile'], gdpinfo['country_name'],
-                                                gdpinfo['separator'], gdpinfo['quote'])
         if country in gdp_data_dict:
             gdp_data = gdp_data_dict[country]
             plot_values = build_plot_values(gdpinfo, gdp_data)
@@ -90,12 +219,194 @@ def build_plot_dict(gdpinfo, country_list):
     return result_dict
 
 
-def render_xy_plot(gdpinfo, country_list, plot_file):
+def downsample_lttb(points, max_points):
+    """
+    Inputs:
+      points     - List of (x, y) tuples sorted by x
+      max_points - Maximum number of points to keep, at least 3
+
+    Output:
+      Returns a list of at most max_points tuples from points chosen
+      with the Largest-Triangle-Three-Buckets algorithm, which keeps
+      the first and last points and, from each bucket in between, the
+      point forming the largest triangle with the previously kept point
+      and the average of the next bucket.  Returns points unchanged if
+      it already has at most max_points tuples.
+    """
+    if max_points < 3:
+        raise ValueError("max_points must be at least 3, got {}".format(max_points))
+    count = len(points)
+    if count <= max_points:
+        return points
+
+    bucket_size = (count - 2) / (max_points - 2)
+    sampled = [points[0]]
+    start = 1
+    for bucket in range(max_points - 2):
+        end = int((bucket + 1) * bucket_size) + 1
+        next_end = min(int((bucket + 2) * bucket_size) + 1, count)
+        next_bucket = points[end:next_end]
+        avg_x = sum(point[0] for point in next_bucket) / len(next_bucket)
+        avg_y = sum(point[1] for point in next_bucket) / len(next_bucket)
+
+        prev_x, prev_y = sampled[-1]
+        best_area = -1.0
+        best_point = None
+        for point in points[start:end]:
+            area = abs((prev_x - avg_x) * (point[1] - prev_y) -
+                       (prev_x - point[0]) * (avg_y - prev_y))
+            if area > best_area:
+                best_area = area
+                best_point = point
+        sampled.append(best_point)
+        start = end
+    sampled.append(points[-1])
+    return sampled
+
+
+# Bump when the rendering code changes so stale cached images are not reused
+RENDER_CACHE_VERSION = 1
+
+
+class RenderCache:
+    """
+    A size-bounded directory of rendered SVG files, each named by a
+    digest of everything that went into the image.  Once the files
+    take more than max_bytes, the least recently used ones are deleted.
+    Recency survives restarts through the modification times of the
+    files.
+    """
+
+    def __init__(self, directory, max_bytes=64 * 2 ** 20):
+        """
+        Inputs:
+          directory - Directory holding the cached files, created if needed
+          max_bytes - Maximum total size of the cached files
+        """
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._sizes = OrderedDict()
+        self._total = 0
+        os.makedirs(directory, exist_ok=True)
+        found = []
+        for entry in os.scandir(directory):
+            if entry.name.endswith(".svg") and entry.is_file():
+                stat = entry.stat()
+                found.append((stat.st_mtime_ns, entry.name[:-len(".svg")], stat.st_size))
+        for _, key, size in sorted(found):
+            self._sizes[key] = size
+            self._total += size
+        self._evict()
+
+    def _path(self, key):
+        return os.path.join(self.directory, key + ".svg")
+
+    def fetch(self, key, output_file):
+        """
+        Inputs:
+          key         - Render key from render_key
+          output_file - Name of the file to write the cached image to
+
+        Output:
+          Returns True, after copying the cached image to output_file,
+          if key is in the cache, and False otherwise.
+        """
+        if key in self._sizes:
+            path = self._path(key)
+            try:
+                shutil.copyfile(path, output_file)
+                os.utime(path)
+            except FileNotFoundError:
+                self._total -= self._sizes.pop(key)
+            else:
+                self._sizes.move_to_end(key)
+                self.hits += 1
+                return True
+        self.misses += 1
+        return False
+
+    def store(self, key, rendered_file):
+        """
+        Inputs:
+          key           - Render key from render_key
+          rendered_file - Name of the freshly rendered image
+
+        Action:
+          Copies rendered_file into the cache under key and evicts the
+          least recently used images until the cache fits in max_bytes.
+          Images larger than max_bytes are not cached.
+        """
+        size = os.path.getsize(rendered_file)
+        if size > self.max_bytes:
+            return
+        path = self._path(key)
+        shutil.copyfile(rendered_file, path + ".tmp")
+        os.replace(path + ".tmp", path)
+        self._total += size - self._sizes.pop(key, 0)
+        self._sizes[key] = size
+        self._evict()
+
+    def _evict(self):
+        while self._total > self.max_bytes:
+            evicted, evicted_size = self._sizes.popitem(last=False)
+            self._total -= evicted_size
+            try:
+                os.remove(self._path(evicted))
+            except FileNotFoundError:
+                pass
+
+    def stats(self):
+        """
+        Output:
+          Returns a dictionary with the hit and miss counts and the
+          number and total size of the cached images.
+        """
+        return {"hits": self.hits, "misses": self.misses,
+                "entries": len(self._sizes), "bytes": self._total}
+
+
+# RenderCache used by the render functions, or None to always render
+_RENDER_CACHE = None
+
+
+def set_render_cache(directory, max_bytes=64 * 2 ** 20):
+    """
+    Inputs:
+      directory - Directory to cache rendered images in, or None to
+                  turn the render cache off
+      max_bytes - Maximum total size of the cached images
+
+    Output:
+      Returns the new RenderCache, or None if it was turned off.
+    """
+    global _RENDER_CACHE
+    _RENDER_CACHE = None if directory is None else RenderCache(directory, max_bytes)
+    return _RENDER_CACHE
+
+
+def render_key(kind, *parts):
+    """
+    Inputs:
+      kind  - String naming the kind of image
+      parts - Values that determine the image, made of strings,
+              numbers, None, tuples and lists
+
+    Output:
+      Returns a hexadecimal SHA-256 digest of kind and parts.
+    """
+    return hashlib.sha256(repr((RENDER_CACHE_VERSION, kind) + parts).encode()).hexdigest()
+
+
+def render_xy_plot(gdpinfo, country_list, plot_file, max_points=None):
     """
     Inputs:
       gdpinfo      - GDP data information dictionary
       country_list - List of strings that are country names
       plot_file    - String that is the output plot file name
+      max_points   - Maximum number of points to plot per country,
+                     or None to plot every point
 
     Output:
       Returns None.
@@ -104,14 +415,30 @@ def render_xy_plot(gdpinfo, country_list, plot_file):
       Creates an SVG image of an XY plot for the GDP data
       specified by gdpinfo for the countries in country_list.
       The image will be stored in a file named by plot_file.
+      Series longer than max_points are reduced with downsample_lttb.
+      If a render cache is set, an identical earlier plot is copied
+      from it instead of being rendered again.
     """
     plot_dict = build_plot_dict(gdpinfo, country_list)
+    if max_points is not None:
+        for country, plot_values in plot_dict.items():
+            plot_dict[country] = downsample_lttb(plot_values, max_points)
+
+    cache = _RENDER_CACHE
+    if cache is not None:
+        key = render_key("xy_plot", [(country, plot_dict[country]) for country in country_list])
+        if cache.fetch(key, plot_file):
+            return
+
+    import pygal
 
     xy_chart = pygal.XY()
     xy_chart.title = 'GDP for Countries in {}'.format(', '.join(country_list))
     for country in country_list:
         xy_chart.add(country, plot_dict[country])
     xy_chart.render_to_file(plot_file)
+    if cache is not None:
+        cache.store(key, plot_file)
 
 
 def test_render_xy_plot():
@@ -135,7 +462,247 @@ def test_render_xy_plot():
                    "isp_gdp_xy_uk+usa.svg")
 
 
+def write_synthetic_gdp_file(filename, numcountries, min_year=1960, max_year=2015, seed=0):
+    """
+    Inputs:
+      filename     - Name of CSV file to write
+      numcountries - Number of country rows
+      min_year     - First year column
+      max_year     - Last year column
+      seed         - Seed for the random number generator
+
+    Output:
+      Writes a World Bank style GDP file with one row per country and
+      one column per year, leaving about one value in ten empty, and
+      returns the GDP data information dictionary describing it.
+    """
+    rng = random.Random(seed)
+    with open(filename, "w", newline='') as csvfile:
+        writer = csv.writer(csvfile, quoting=csv.QUOTE_ALL)
+        writer.writerow(["Country Name", "Country Code", "Indicator Name", "Indicator Code"] +
+                        [str(year) for year in range(min_year, max_year + 1)])
+        for country in range(numcountries):
+            values = ["" if rng.random() < 0.1 else repr(rng.uniform(1e8, 1e13))
+                      for _ in range(min_year, max_year + 1)]
+            writer.writerow(["Country {}".format(country), "C{:05d}".format(country),
+                             "GDP (current US$)", "NY.GDP.MKTP.CD"] + values)
+    return {
+        "gdpfile": filename,
+        "separator": ",",
+        "quote": '"',
+        "min_year": min_year,
+        "max_year": max_year,
+        "country_name": "Country Name",
+        "country_code": "Country Code"
+    }
+
+
+def benchmark_nested_dict_memory(numcountries=20000):
+    """
+    Inputs:
+      numcountries - Number of countries in the synthetic GDP file
+
+    Output:
+      Prints and returns a dictionary mapping each reader to a tuple of
+      the load time in seconds and the memory in bytes still held by
+      the loaded table.
+    """
+    results = {}
+    with tempfile.TemporaryDirectory() as directory:
+        gdpinfo = write_synthetic_gdp_file(os.path.join(directory, "gdp.csv"), numcountries)
+        args = (gdpinfo["gdpfile"], gdpinfo["country_name"], gdpinfo["separator"], gdpinfo["quote"])
+        for reader in (read_csv_as_nested_dict, read_csv_as_compact_nested_dict):
+            start = time.perf_counter()
+            reader(*args)
+            elapsed = time.perf_counter() - start
+
+            tracemalloc.start()
+            table = reader(*args)
+            held = tracemalloc.get_traced_memory()[0]
+            tracemalloc.stop()
+            del table
+            results[reader.__name__] = (elapsed, held)
+
+    for name, (elapsed, held) in results.items():
+        print("{}: {} rows in {:.3f} s, {:.1f} MiB held".format(
+            name, numcountries, elapsed, held / 2 ** 20))
+    return results
+
+
+def benchmark_build_plot_dict(sizes=(1, 10, 50, 100, 200), numcountries=250):
+    """
+    Inputs:
+      sizes        - Numbers of countries to build plot values for
+      numcountries - Number of countries in the synthetic GDP file
+
+    Output:
+      Prints and returns a dictionary mapping each size to a tuple of
+      the time in seconds taken when the GDP file is parsed once per
+      country, as build_plot_dict used to do, and when build_plot_dict
+      parses it once and caches it.
+    """
+    results = {}
+    with tempfile.TemporaryDirectory() as directory:
+        gdpinfo = write_synthetic_gdp_file(os.path.join(directory, "gdp.csv"), numcountries)
+        for size in sizes:
+            country_list = ["Country {}".format(country) for country in range(size)]
+
+            start = time.perf_counter()
+            expected = {}
+            for country in country_list:
+                table = read_csv_as_nested_dict(gdpinfo['gdpfile'], gdpinfo['country_name'],
+                                                gdpinfo['separator'], gdpinfo['quote'])
+                expected[country] = build_plot_values(gdpinfo, table[country])
+            per_country = time.perf_counter() - start
+
+            clear_gdp_cache()
+            start = time.perf_counter()
+            plot_dict = build_plot_dict(gdpinfo, country_list)
+            once = time.perf_counter() - start
+
+            assert plot_dict == expected
+            results[size] = (per_country, once)
+            print("{} countries: {:.4f} s parsing per country, {:.4f} s parsing once".format(
+                size, per_country, once))
+    clear_gdp_cache()
+    return results
+
+
+def benchmark_render_xy_plot(lengths=(100, 1000, 10000), numcountries=5, max_points=200):
+    """
+    Inputs:
+      lengths      - Numbers of years in each synthetic GDP series
+      numcountries - Number of countries to plot
+      max_points   - Point budget per country for the reduced plot
+
+    Output:
+      Prints and returns a dictionary mapping each length to a tuple of
+      the render time in seconds and SVG size in bytes of the full plot
+      followed by those of the plot reduced to max_points per country.
+    """
+    results = {}
+    with tempfile.TemporaryDirectory() as directory:
+        plot_file = os.path.join(directory, "plot.svg")
+        for length in lengths:
+            gdpinfo = write_synthetic_gdp_file(os.path.join(directory, "gdp.csv"), numcountries,
+                                               min_year=1, max_year=length)
+            country_list = ["Country {}".format(country) for country in range(numcountries)]
+            build_plot_dict(gdpinfo, country_list)
+
+            timings = []
+            for budget in (None, max_points):
+                start = time.perf_counter()
+                render_xy_plot(gdpinfo, country_list, plot_file, budget)
+                timings.append(time.perf_counter() - start)
+                timings.append(os.path.getsize(plot_file))
+            results[length] = tuple(timings)
+            print("{} years: full {:.3f} s, {} bytes; {} points {:.3f} s, {} bytes".format(
+                length, timings[0], timings[1], max_points, timings[2], timings[3]))
+    clear_gdp_cache()
+    return results
+
+
+def benchmark_render_cache(numplots=4, numcountries=5, length=2000):
+    """
+    Inputs:
+      numplots     - Number of distinct plots to render
+      numcountries - Number of countries in each plot
+      length       - Number of years in each synthetic GDP series
+
+    Output:
+      Renders numplots plots twice with a render cache big enough for
+      all of them and once more with one that only holds half of them,
+      and prints and returns a dictionary mapping each pass to a tuple
+      of its time in seconds and the cache statistics after it.
+    """
+    global _RENDER_CACHE
+    results = {}
+    previous = _RENDER_CACHE
+    with tempfile.TemporaryDirectory() as directory:
+        gdpinfo = write_synthetic_gdp_file(os.path.join(directory, "gdp.csv"),
+                                           numplots * numcountries, min_year=1, max_year=length)
+        plots = [["Country {}".format(plot * numcountries + country)
+                  for country in range(numcountries)] for plot in range(numplots)]
+        plot_file = os.path.join(directory, "plot.svg")
+        build_plot_dict(gdpinfo, [])
+        render_xy_plot(gdpinfo, [], plot_file)
+
+        cache = set_render_cache(os.path.join(directory, "cache"))
+        for name in ("cold", "warm"):
+            start = time.perf_counter()
+            for country_list in plots:
+                render_xy_plot(gdpinfo, country_list, plot_file)
+            results[name] = (time.perf_counter() - start, cache.stats())
+
+        cache = set_render_cache(os.path.join(directory, "cache"), cache.stats()["bytes"] // 2)
+        start = time.perf_counter()
+        for country_list in plots:
+            render_xy_plot(gdpinfo, country_list, plot_file)
+        results["half size"] = (time.perf_counter() - start, cache.stats())
+
+    _RENDER_CACHE = previous
+    for name, (elapsed, stats) in results.items():
+        print("{}: {} plots in {:.3f} s, {}".format(name, numplots, elapsed, stats))
+    clear_gdp_cache()
+    return results
+
+
+def benchmark_import_time():
+    """
+    Output:
+      Imports this module in a fresh interpreter with -X importtime and
+      prints and returns a tuple of the cumulative import time of the
+      module in microseconds, whether pygal was imported with it, the
+      number of characters written to stdout and the list of data files
+      opened while importing it.
+
+    Action:
+      Raises AssertionError if importing the module opens a data file
+      or writes to stdout.
+    """
+    directory = os.path.dirname(os.path.abspath(__file__))
+    module = os.path.splitext(os.path.basename(__file__))[0]
+    probe = "\n".join([
+        "import contextlib, io, os, sys",
+        "opened = []",
+        "def audit(event, args):",
+        "    if (event == 'open' and isinstance(args[0], str)",
+        "            and not args[0].endswith(('.py', '.pyc'))):",
+        "        opened.append(os.path.basename(args[0]))",
+        "sys.addaudithook(audit)",
+        "output = io.StringIO()",
+        "with contextlib.redirect_stdout(output):",
+        "    import {}".format(module),
+        "print('pygal' in sys.modules, len(output.getvalue()), *opened, sep='\\t')",
+    ])
+    completed = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", probe],
+        cwd=directory, capture_output=True, text=True, check=True)
+    cumulative = None
+    for line in completed.stderr.splitlines():
+        fields = line.split("|")
+        if len(fields) == 3 and fields[2].strip() == module:
+            cumulative = int(fields[1])
+    report = completed.stdout.rstrip("\n").split("\t")
+    pygal_imported = report[0] == "True"
+    printed = int(report[1])
+    opened = report[2:]
+    print("import {}: {} us cumulative, pygal imported: {}, "
+          "{} characters printed, files opened: {}".format(
+              module, cumulative, pygal_imported, printed, opened))
+    assert not opened and not printed, "importing {} has side effects".format(module)
+    return cumulative, pygal_imported, printed, opened
+
+
 # Make sure the following call to test_render_xy_plot is commented out
 # when submitting to OwlTest/CourseraTest.
 
 # test_render_xy_plot()
+
+# Uncomment to run the benchmarks.
+
+# benchmark_nested_dict_memory()
+# benchmark_build_plot_dict()
+# benchmark_render_xy_plot()
+# benchmark_render_cache()
+# benchmark_import_time()
@@ -1,5 +1,36 @@
+import bisect
+import difflib
+import itertools
+import locale
+import mmap
+import operator
+import os
+import random
+import re
+import tempfile
+import time
+import tracemalloc
+from array import array
+from collections import Counter
+from collections.abc import Sequence
+
 IDENTICAL = -1
 
+# Size in bytes of the read buffer used when streaming files
+READ_BUFFER_SIZE = 1 << 20
+
+# Number of lines compared at once before looking for the differing line
+DIFF_BLOCK_LINES = 1024
+
+# Number of characters compared at once before looking for the differing one
+DIFF_CHUNK_CHARS = 4096
+
+# Lines shorter than this are compared one character at a time
+DIFF_SHORT_CHARS = 32
+
+# Line terminators recognised by files opened in text mode
+NEWLINE = re.compile(rb"\r\n|\r|\n")
+
 
 def singleline_diff(line1, line2):
     """
@@ -14,11 +45,29 @@ def singleline_diff(line1, line2):
     """
     if line1 == line2:
         return IDENTICAL
-    else:
-        for num in range(0, min(len(line1), len(line2))):
+    shortest = min(len(line1), len(line2))
+    if shortest < DIFF_SHORT_CHARS:
+        for num in range(0, shortest):
             if line1[num] != line2[num]:
                 return num
-        return min(len(line1), len(line2))
+        return shortest
+    # Find the first chunk that differs with slice comparisons
+    low = 0
+    while low < shortest:
+        high = min(low + DIFF_CHUNK_CHARS, shortest)
+        if line1[low:high] != line2[low:high]:
+            break
+        low = high
+    else:
+        return shortest
+    # Bisect the chunk, keeping a difference within line1[low:high]
+    while high - low > 1:
+        mid = (low + high) // 2
+        if line1[low:mid] == line2[low:mid]:
+            low = mid
+        else:
+            high = mid
+    return low
 
 
 def singleline_diff_format(line1, line2, idx):
@@ -63,10 +112,20 @@ def multiline_diff(lines1, lines2):
           Returns (IDENTICAL, IDENTICAL) if the two lists are the same.
     """
     length = len(lines1) - len(lines2)
-    for index in range(0, min(len(lines1), len(lines2))):
-        diff = singleline_diff(lines1[index], lines2[index])
-        if diff != IDENTICAL:
-            return index, diff
+    shortest = min(len(lines1), len(lines2))
+    mapped = isinstance(lines1, MappedFileLines) and isinstance(lines2, MappedFileLines)
+    # Skip whole blocks of equal lines with one comparison each and only
+    # look at single lines inside the first block that differs
+    for start in range(0, shortest, DIFF_BLOCK_LINES):
+        stop = min(start + DIFF_BLOCK_LINES, shortest)
+        if mapped and lines1.raw_lines(start, stop) == lines2.raw_lines(start, stop):
+            continue
+        if lines1[start:stop] == lines2[start:stop]:
+            continue
+        for index in range(start, stop):
+            diff = singleline_diff(lines1[index], lines2[index])
+            if diff != IDENTICAL:
+                return index, diff
     if length > 0:
         return len(lines2), 0
     elif length < 0:
@@ -75,18 +134,116 @@ def multiline_diff(lines1, lines2):
         return IDENTICAL, IDENTICAL
 
 
-def get_file_lines(filename):
+class MappedFileLines(Sequence):
+    """
+    Read-only sequence of the lines of a file, cleaned up the same way
+    as get_file_lines, backed by a memory map of the file.  The line
+    offsets are found in one scan on first use and lines are decoded
+    only when they are looked up.  The file must use an encoding in
+    which newline and return are single ASCII bytes, such as UTF-8.
+    """
+
+    def __init__(self, filename):
+        """
+        Inputs:
+          filename - name of file to map
+        """
+        self.filename = filename
+        self._encoding = locale.getpreferredencoding(False)
+        with open(filename, "rb") as file:
+            if os.fstat(file.fileno()).st_size:
+                self._map = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+            else:
+                self._map = b""
+        self._starts = None
+
+    def _line_starts(self):
+        """
+        Output:
+          Returns an array of the byte offsets at which each line
+          starts, followed by the size of the file.
+        """
+        if self._starts is None:
+            data = self._map
+            size = len(data)
+            starts = array("q", [0])
+            position = 0
+            while position < size:
+                # Extend each chunk to a newline so no terminator is split
+                end = data.find(b"\n", min(position + READ_BUFFER_SIZE, size) - 1) + 1 or size
+                chunk = data[position:end]
+                if b"\r" in chunk:
+                    starts.extend(position + match.end() for match in NEWLINE.finditer(chunk))
+                else:
+                    # Line lengths summed in C; the last part has no newline
+                    lengths = map(operator.add, map(len, chunk.split(b"\n")[:-1]), itertools.repeat(1))
+                    starts.pop()
+                    starts.extend(itertools.accumulate(lengths, initial=position))
+                position = end
+            if starts[-1] != size:
+                starts.append(size)
+            self._starts = starts
+        return self._starts
+
+    def __len__(self):
+        return len(self._line_starts()) - 1
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[line] for line in range(*index.indices(len(self)))]
+        starts = self._line_starts()
+        index = range(len(starts) - 1)[index]
+        raw = self._map[starts[index]:starts[index + 1]]
+        if NEWLINE.fullmatch(raw):
+            return "\n"
+        return raw.decode(self._encoding).rstrip()
+
+    def raw_lines(self, start, stop):
+        """
+        Inputs:
+          start - number of the first line
+          stop  - number of the line after the last one
+        Output:
+          Returns the bytes of lines start to stop - 1, terminators
+          included.  Equal bytes always give equal lines.
+        """
+        starts = self._line_starts()
+        return self._map[starts[start]:starts[stop]]
+
+    def close(self):
+        """
+        Unmaps the file.
+        """
+        if isinstance(self._map, mmap.mmap):
+            self._map.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def get_file_lines(filename, mapped=False):
     """
     Inputs:
       filename - name of file to read
+      mapped   - True to return a MappedFileLines view of the file
+                 instead of reading every line up front
     Output:
       Returns a list of lines from the file named filename.  Each
       line will be a single line string with no newline ('\n') or
       return ('\r') characters.
 
+      If mapped is True, returns a MappedFileLines view of the same
+      lines instead of a list.  The view should be closed, or used as
+      a context manager, to unmap the file.
+
       If the file does not exist or is not readable, then the
       behavior of this function is undefined.
     """
+    if mapped:
+        return MappedFileLines(filename)
     with open(filename, "r") as file:
         content = file.readlines()
     for index in range(0, len(content)):
@@ -95,6 +252,27 @@ def get_file_lines(filename):
     return content
 
 
+def iter_diff_lines(filename):
+    """
+    Inputs:
+      filename - name of file to read
+    Output:
+      Returns a generator over the lines of the file named filename,
+      read lazily through a READ_BUFFER_SIZE buffer.  Lines are cleaned
+      up the same way as get_file_lines, and the first line that is
+      just a newline is skipped, as file_diff_format has always done.
+    """
+    with open(filename, "r", buffering=READ_BUFFER_SIZE) as file:
+        skipped_blank = False
+        for line in file:
+            if line != "\n":
+                yield line.rstrip()
+            elif skipped_blank:
+                yield line
+            else:
+                skipped_blank = True
+
+
 def file_diff_format(filename1, filename2):
     """
     Inputs:
@@ -109,24 +287,530 @@ def file_diff_format(filename1, filename2):
 
       If either file does not exist or is not readable, then the
       behavior of this function is undefined.
+
+      The files are read in lockstep and reading stops at the first
+      differing line, so memory use does not grow with file size.
     """
-    file1 = get_file_lines(filename1)
-    file2 = get_file_lines(filename2)
-    if "\n" in file1:
-        file1.remove("\n")
-    if "\n" in file2:
-        file2.remove("\n")
-    diff = tuple(multiline_diff(file1, file2))
-    if diff == (IDENTICAL, IDENTICAL):
-        return "No differences\n"
-    else:
-        if len(file1) != 0 and len(file2) != 0:
-            return "Line " + str(diff[0]) + ":\n" + \
-                singleline_diff_format(file1[diff[0]], file2[diff[0]], diff[1])
-        elif len(file1) == 0:
-            return "Line " + str(diff[0]) + ":\n" + \
-                singleline_diff_format("", file2[diff[0]], diff[1])
+    lines1 = iter_diff_lines(filename1)
+    lines2 = iter_diff_lines(filename2)
+    offset = 0
+    try:
+        while True:
+            block1 = list(itertools.islice(lines1, DIFF_BLOCK_LINES))
+            block2 = list(itertools.islice(lines2, DIFF_BLOCK_LINES))
+            line, diff = multiline_diff(block1, block2)
+            if line != IDENTICAL:
+                # A file that ran out of lines first shows an empty line
+                line1 = block1[line] if line < len(block1) else ""
+                line2 = block2[line] if line < len(block2) else ""
+                return "Line " + str(offset + line) + ":\n" + \
+                    singleline_diff_format(line1, line2, diff)
+            if not block1:
+                break
+            offset += len(block1)
+    finally:
+        lines1.close()
+        lines2.close()
+    return "No differences\n"
+
+
+def unique_anchors(seq1, lo1, hi1, seq2, lo2, hi2):
+    """
+    Inputs:
+      seq1, seq2 - lists of line ids
+      lo1, hi1   - range of seq1 to match
+      lo2, hi2   - range of seq2 to match
+    Output:
+      Returns the longest list of (index1, index2) pairs, increasing in
+      both indices, of ids that occur exactly once in each range, as
+      used by patience diff.
+    """
+    counts1 = Counter(seq1[lo1:hi1])
+    counts2 = Counter(seq2[lo2:hi2])
+    positions1 = {}
+    for index in range(lo1, hi1):
+        if counts1[seq1[index]] == 1:
+            positions1[seq1[index]] = index
+    pairs = [(positions1[seq2[index]], index) for index in range(lo2, hi2)
+             if counts2[seq2[index]] == 1 and seq2[index] in positions1]
+
+    # Longest increasing subsequence of the first indices
+    tails = []
+    tail_pairs = []
+    previous = [None] * len(pairs)
+    for number, (index1, _) in enumerate(pairs):
+        position = bisect.bisect_left(tails, index1)
+        if position:
+            previous[number] = tail_pairs[position - 1]
+        if position == len(tails):
+            tails.append(index1)
+            tail_pairs.append(number)
+        else:
+            tails[position] = index1
+            tail_pairs[position] = number
+    anchors = []
+    number = tail_pairs[-1] if tail_pairs else None
+    while number is not None:
+        anchors.append(pairs[number])
+        number = previous[number]
+    anchors.reverse()
+    return anchors
+
+
+def myers_middle_snake(seq1, lo1, hi1, seq2, lo2, hi2):
+    """
+    Inputs:
+      seq1, seq2 - lists of line ids
+      lo1, hi1   - range of seq1 to compare
+      lo2, hi2   - range of seq2 to compare
+    Output:
+      Returns the (index1, index2) point at which a shortest edit
+      script between the two ranges can be split in two, found by
+      running Myers' O(ND) search from both ends in linear space, or
+      None if the ranges have no line in common.
+    """
+    len1 = hi1 - lo1
+    len2 = hi2 - lo2
+    max_d = (len1 + len2 + 1) // 2
+    offset = max_d
+    size = 2 * max_d + 2
+    forward = [-1] * size
+    backward = [-1] * size
+    forward[offset + 1] = 0
+    backward[offset + 1] = 0
+    delta = len1 - len2
+    odd = delta % 2 != 0
+    k1start = k1end = k2start = k2end = 0
+    for d in range(max_d):
+        for k1 in range(-d + k1start, d + 1 - k1end, 2):
+            k1_offset = offset + k1
+            if k1 == -d or (k1 != d and forward[k1_offset - 1] < forward[k1_offset + 1]):
+                x1 = forward[k1_offset + 1]
+            else:
+                x1 = forward[k1_offset - 1] + 1
+            y1 = x1 - k1
+            while x1 < len1 and y1 < len2 and seq1[lo1 + x1] == seq2[lo2 + y1]:
+                x1 += 1
+                y1 += 1
+            forward[k1_offset] = x1
+            if x1 > len1:
+                k1end += 2
+            elif y1 > len2:
+                k1start += 2
+            elif odd:
+                k2_offset = offset + delta - k1
+                if 0 <= k2_offset < size and backward[k2_offset] != -1:
+                    if x1 >= len1 - backward[k2_offset]:
+                        return lo1 + x1, lo2 + y1
+        for k2 in range(-d + k2start, d + 1 - k2end, 2):
+            k2_offset = offset + k2
+            if k2 == -d or (k2 != d and backward[k2_offset - 1] < backward[k2_offset + 1]):
+                x2 = backward[k2_offset + 1]
+            else:
+                x2 = backward[k2_offset - 1] + 1
+            y2 = x2 - k2
+            while (x2 < len1 and y2 < len2 and
+                   seq1[hi1 - x2 - 1] == seq2[hi2 - y2 - 1]):
+                x2 += 1
+                y2 += 1
+            backward[k2_offset] = x2
+            if x2 > len1:
+                k2end += 2
+            elif y2 > len2:
+                k2start += 2
+            elif not odd:
+                k1_offset = offset + delta - k2
+                if 0 <= k1_offset < size and forward[k1_offset] != -1:
+                    x1 = forward[k1_offset]
+                    if x1 >= len1 - x2:
+                        return lo1 + x1, lo2 + x1 - (k1_offset - offset)
+    return None
+
+
+def diff_ranges(seq1, seq2):
+    """
+    Inputs:
+      seq1, seq2 - lists of line ids
+    Output:
+      Returns a generator of (start1, stop1, start2, stop2) ranges, in
+      order, that together turn seq1 into seq2.  Neighbouring ranges
+      may touch.
+    """
+    stack = [(0, len(seq1), 0, len(seq2))]
+    while stack:
+        lo1, hi1, lo2, hi2 = stack.pop()
+        while lo1 < hi1 and lo2 < hi2 and seq1[lo1] == seq2[lo2]:
+            lo1 += 1
+            lo2 += 1
+        while lo1 < hi1 and lo2 < hi2 and seq1[hi1 - 1] == seq2[hi2 - 1]:
+            hi1 -= 1
+            hi2 -= 1
+        if lo1 == hi1 or lo2 == hi2:
+            if lo1 != hi1 or lo2 != hi2:
+                yield lo1, hi1, lo2, hi2
+            continue
+
+        anchors = unique_anchors(seq1, lo1, hi1, seq2, lo2, hi2)
+        if anchors:
+            # Diff the gaps between lines that are unique on both sides
+            segments = []
+            for index1, index2 in anchors:
+                segments.append((lo1, index1, lo2, index2))
+                lo1 = index1 + 1
+                lo2 = index2 + 1
+            segments.append((lo1, hi1, lo2, hi2))
+            stack.extend(reversed(segments))
+            continue
+
+        split = myers_middle_snake(seq1, lo1, hi1, seq2, lo2, hi2)
+        if split is None or split in ((lo1, lo2), (hi1, hi2)):
+            yield lo1, hi1, lo2, hi2
         else:
-            return "Line " + str(diff[0]) + ":\n" + \
-                singleline_diff_format(file1[diff[0]], "", diff[1])
-# print(file_diff_format("abc.txt", "efg.txt"))
\ No newline at end of file
+            index1, index2 = split
+            stack.append((index1, hi1, index2, hi2))
+            stack.append((lo1, index1, lo2, index2))
+
+
+def diff_hunks(lines1, lines2):
+    """
+    Inputs:
+      lines1 - list of single line strings
+      lines2 - list of single line strings
+    Output:
+      Returns a generator over every difference between lines1 and
+      lines2, in order, as (start1, stop1, start2, stop2) tuples
+      meaning that lines1[start1:stop1] is replaced by
+      lines2[start2:stop2].  Either range is empty for pure insertions
+      and deletions.  The generator is empty if the lists are the same.
+
+      Lines are hashed to integer ids once, split around lines that
+      are unique on both sides (patience diff), and the remaining gaps
+      are diffed with Myers' O(ND) algorithm.
+    """
+    ids = {}
+    seq1 = [ids.setdefault(line, len(ids)) for line in lines1]
+    seq2 = [ids.setdefault(line, len(ids)) for line in lines2]
+    pending = None
+    for hunk in diff_ranges(seq1, seq2):
+        if pending is not None and pending[1] == hunk[0] and pending[3] == hunk[2]:
+            pending = (pending[0], hunk[1], pending[2], hunk[3])
+            continue
+        if pending is not None:
+            yield pending
+        pending = hunk
+    if pending is not None:
+        yield pending
+
+
+def format_unified_range(start, stop):
+    """
+    Inputs:
+      start - index of the first line of a range
+      stop  - index after the last line of the range
+    Output:
+      Returns the range as written in a unified diff hunk header.
+    """
+    length = stop - start
+    if length == 1:
+        return str(start + 1)
+    if length == 0:
+        return "{},0".format(start)
+    return "{},{}".format(start + 1, length)
+
+
+def unified_diff(lines1, lines2, context=3):
+    """
+    Inputs:
+      lines1  - list of single line strings
+      lines2  - list of single line strings
+      context - number of unchanged lines to show around each change
+    Output:
+      Returns a generator over the lines, without line terminators, of
+      a unified diff of lines1 and lines2 built from diff_hunks.
+      Changes at most 2 * context lines apart share one hunk.
+    """
+    def format_group(group):
+        start1 = max(0, group[0][0] - context)
+        start2 = group[0][2] - (group[0][0] - start1)
+        stop1 = min(len(lines1), group[-1][1] + context)
+        stop2 = group[-1][3] + (stop1 - group[-1][1])
+        yield "@@ -{} +{} @@".format(format_unified_range(start1, stop1),
+                                     format_unified_range(start2, stop2))
+        position = start1
+        for hunk_start1, hunk_stop1, hunk_start2, hunk_stop2 in group:
+            for line in lines1[position:hunk_start1]:
+                yield " " + line
+            for line in lines1[hunk_start1:hunk_stop1]:
+                yield "-" + line
+            for line in lines2[hunk_start2:hunk_stop2]:
+                yield "+" + line
+            position = hunk_stop1
+        for line in lines1[position:stop1]:
+            yield " " + line
+
+    group = []
+    for hunk in diff_hunks(lines1, lines2):
+        if group and hunk[0] - group[-1][1] > 2 * context:
+            yield from format_group(group)
+            group = []
+        group.append(hunk)
+    if group:
+        yield from format_group(group)
+
+
+def file_diff_hunks(filename1, filename2):
+    """
+    Inputs:
+      filename1 - name of first file
+      filename2 - name of second file
+    Output:
+      Returns a generator over every difference between the lines, as
+      read by get_file_lines, of the two files named by the inputs, in
+      the form produced by diff_hunks.  The files stay mapped until the
+      generator is exhausted or closed.
+    """
+    with get_file_lines(filename1, mapped=True) as lines1, \
+            get_file_lines(filename2, mapped=True) as lines2:
+        yield from diff_hunks(lines1, lines2)
+
+
+def benchmark_singleline_diff(lengths=(10, 100, 1000, 10 ** 4, 10 ** 5, 10 ** 6, 10 ** 7)):
+    """
+    Inputs:
+      lengths - line lengths in characters to time
+    Output:
+      Prints and returns a dictionary mapping each length to a tuple of
+      the time in seconds of finding a difference in the last character
+      one character at a time, as singleline_diff used to, and with
+      singleline_diff.
+    """
+    def char_by_char(line1, line2):
+        if line1 == line2:
+            return IDENTICAL
+        for num in range(0, min(len(line1), len(line2))):
+            if line1[num] != line2[num]:
+                return num
+        return min(len(line1), len(line2))
+
+    results = {}
+    for length in lengths:
+        line1 = "x" * length
+        line2 = "x" * (length - 1) + "y"
+        repeats = max(1, 10 ** 6 // length)
+        timings = []
+        for function in (char_by_char, singleline_diff):
+            start = time.perf_counter()
+            for _ in range(repeats):
+                result = function(line1, line2)
+            timings.append((time.perf_counter() - start) / repeats)
+            assert result == length - 1
+        results[length] = tuple(timings)
+        print("{} characters: char by char {:.3g} s, chunked {:.3g} s".format(
+            length, timings[0], timings[1]))
+    return results
+
+
+def benchmark_multiline_diff(numlines=1000000, diff_lines=(10, 500000, None)):
+    """
+    Inputs:
+      numlines   - number of lines in each synthetic list
+      diff_lines - line numbers of the difference to time, None for
+                   identical lists
+    Output:
+      Prints and returns a dictionary mapping each difference line to
+      a tuple of the time in seconds of calling singleline_diff on each
+      line pair, as multiline_diff used to, and of multiline_diff.
+    """
+    def line_by_line(lines1, lines2):
+        for index in range(0, min(len(lines1), len(lines2))):
+            diff = singleline_diff(lines1[index], lines2[index])
+            if diff != IDENTICAL:
+                return index, diff
+        return IDENTICAL, IDENTICAL
+
+    results = {}
+    lines1 = ["{:08d} {}".format(index, "x" * 71) for index in range(numlines)]
+    for diff_line in diff_lines:
+        # Copy the strings so equal lines are not the same objects
+        lines2 = [line.encode().decode() for line in lines1]
+        if diff_line is not None:
+            lines2[diff_line] = lines2[diff_line][:40] + "y" + lines2[diff_line][41:]
+        timings = []
+        for function in (line_by_line, multiline_diff):
+            start = time.perf_counter()
+            result = function(lines1, lines2)
+            timings.append(time.perf_counter() - start)
+        assert result == line_by_line(lines1, lines2)
+        results[diff_line] = tuple(timings)
+        print("difference at line {} of {}: line by line {:.4f} s, blocks {:.4f} s".format(
+            diff_line, numlines, timings[0], timings[1]))
+    return results
+
+
+def benchmark_get_file_lines(numlines=1000000):
+    """
+    Inputs:
+      numlines - number of lines in each synthetic file
+    Output:
+      Prints and returns a dictionary mapping each mode of
+      get_file_lines to a tuple of the time in seconds and peak traced
+      memory in bytes of opening two identical files, counting their
+      lines and comparing them with multiline_diff.  The pages of a
+      memory map are not traced.
+    """
+    def compare(filename1, filename2, mapped):
+        if not mapped:
+            return multiline_diff(get_file_lines(filename1), get_file_lines(filename2))
+        with get_file_lines(filename1, mapped) as lines1, \
+                get_file_lines(filename2, mapped) as lines2:
+            len(lines1)
+            return multiline_diff(lines1, lines2)
+
+    results = {}
+    with tempfile.TemporaryDirectory() as directory:
+        filename1 = os.path.join(directory, "file1.txt")
+        filename2 = os.path.join(directory, "file2.txt")
+        write_synthetic_diff_files(filename1, filename2, numlines, None)
+        for mapped in (False, True):
+            start = time.perf_counter()
+            assert compare(filename1, filename2, mapped) == (IDENTICAL, IDENTICAL)
+            elapsed = time.perf_counter() - start
+
+            tracemalloc.start()
+            compare(filename1, filename2, mapped)
+            peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+            name = "mapped" if mapped else "list"
+            results[name] = (elapsed, peak)
+            print("{}: {} lines in {:.3f} s, {:.1f} MiB peak".format(
+                name, numlines, elapsed, peak / 2 ** 20))
+    return results
+
+
+def edited_lines(numlines, numedits, seed=0):
+    """
+    Inputs:
+      numlines - number of lines in the original list
+      numedits - number of random edits to make
+      seed     - seed for the random number generator
+    Output:
+      Returns a tuple of a list of numlines lines, one in ten of which
+      repeats an earlier one, and a copy of it with numedits lines
+      replaced, inserted or deleted at random.
+    """
+    rng = random.Random(seed)
+    lines1 = ["{:08d} {}".format(rng.randrange(index) if index and rng.random() < 0.1 else index,
+                                 "x" * 40) for index in range(numlines)]
+    lines2 = list(lines1)
+    for edit in range(numedits):
+        index = rng.randrange(len(lines2))
+        action = rng.randrange(3)
+        if action == 0:
+            lines2[index] = "edit {}".format(edit)
+        elif action == 1:
+            lines2.insert(index, "insert {}".format(edit))
+        else:
+            del lines2[index]
+    return lines1, lines2
+
+
+def benchmark_unified_diff(sizes=(100000, 1000000), edits_per_line=0.001):
+    """
+    Inputs:
+      sizes          - numbers of lines to diff
+      edits_per_line - fraction of the lines that are edited
+    Output:
+      Prints and returns a dictionary mapping each size to a tuple of
+      the time in seconds of difflib.unified_diff and of unified_diff,
+      followed by the number of changed lines each one reports.
+    """
+    def changed(diff_lines):
+        return sum(1 for line in diff_lines if line[:1] in "+-" and line[:3] not in ("+++", "---"))
+
+    results = {}
+    for size in sizes:
+        lines1, lines2 = edited_lines(size, int(size * edits_per_line))
+        measured = []
+        for function in (difflib.unified_diff, unified_diff):
+            start = time.perf_counter()
+            if function is difflib.unified_diff:
+                diff_lines = list(function(lines1, lines2, lineterm=""))
+            else:
+                diff_lines = list(function(lines1, lines2))
+            measured.append(time.perf_counter() - start)
+            measured.append(changed(diff_lines))
+        results[size] = (measured[0], measured[2], measured[1], measured[3])
+        print("{} lines: difflib {:.3f} s, {} changed lines; patience/Myers {:.3f} s, "
+              "{} changed lines".format(size, measured[0], measured[1], measured[2], measured[3]))
+    return results
+
+
+def write_synthetic_diff_files(filename1, filename2, numlines, diff_line):
+    """
+    Inputs:
+      filename1 - name of first file to write
+      filename2 - name of second file to write
+      numlines  - number of lines in each file
+      diff_line - line number at which the second file differs, or
+                  None to make the files identical
+    Output:
+      Writes two files of numlines 80 character lines that only differ
+      in the middle of line diff_line.
+    """
+    with open(filename1, "w") as file1, open(filename2, "w") as file2:
+        for index in range(numlines):
+            line = "{:08d} {}\n".format(index, "x" * 71)
+            file1.write(line)
+            if index == diff_line:
+                line = line[:40] + "y" + line[41:]
+            file2.write(line)
+
+
+def benchmark_file_diff_format(numlines=1000000, diff_lines=(10, None)):
+    """
+    Inputs:
+      numlines   - number of lines in each synthetic file
+      diff_lines - line numbers of the difference to time, None for
+                   identical files
+    Output:
+      Prints and returns a dictionary mapping each difference line to
+      a tuple of the time in seconds and peak traced memory in bytes of
+      loading both files whole with get_file_lines and multiline_diff,
+      followed by those of the streaming file_diff_format.
+    """
+    def whole(filename1, filename2):
+        return multiline_diff(get_file_lines(filename1), get_file_lines(filename2))
+
+    results = {}
+    with tempfile.TemporaryDirectory() as directory:
+        filename1 = os.path.join(directory, "file1.txt")
+        filename2 = os.path.join(directory, "file2.txt")
+        for diff_line in diff_lines:
+            write_synthetic_diff_files(filename1, filename2, numlines, diff_line)
+            measured = []
+            for function in (whole, file_diff_format):
+                start = time.perf_counter()
+                function(filename1, filename2)
+                measured.append(time.perf_counter() - start)
+
+                tracemalloc.start()
+                function(filename1, filename2)
+                measured.append(tracemalloc.get_traced_memory()[1])
+                tracemalloc.stop()
+            results[diff_line] = tuple(measured)
+            print("difference at line {} of {}: whole files {:.3f} s, {:.1f} MiB peak; "
+                  "streaming {:.3f} s, {:.1f} MiB peak".format(
+                      diff_line, numlines, measured[0], measured[1] / 2 ** 20,
+                      measured[2], measured[3] / 2 ** 20))
+    return results
+
+
+# print(file_diff_format("abc.txt", "efg.txt"))
+
+# Uncomment to run the benchmarks.
+
+# benchmark_singleline_diff()
+# benchmark_multiline_diff()
+# benchmark_file_diff_format()
+# benchmark_get_file_lines()
+# benchmark_unified_diff()
@@ -7,8 +7,38 @@ about the expected behavior of the program.
 """
 
 import csv
+import hashlib
 import math
-import pygal
+import os
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from collections import OrderedDict
+from collections.abc import Mapping
+from itertools import compress
+
+# NumPy module, imported on first use: False until then, None if it is
+# not installed
+np = False
+
+
+def load_numpy():
+    """
+    Output:
+      Returns the numpy module, importing it on first use, or None if
+      NumPy is not installed.
+    """
+    global np
+    if np is False:
+        try:
+            import numpy
+            np = numpy
+        except ImportError:
+            np = None
+    return np
 
 
 def read_csv_as_nested_dict(filename, keyfield, separator, quote):
@@ -34,12 +64,132 @@ def read_csv_as_nested_dict(filename, keyfield, separator, quote):
     return table
 
 
-def reconcile_countries_by_name(plot_countries, gdp_countries):
+class CsvRow(Mapping):
+    """
+    Read-only row of a CSV file that shares one field name to position
+    mapping with every other row of the same file and stores only a
+    tuple of its own values.  Supports row[field], field in row, get,
+    keys, items and comparison with dictionaries.
+    """
+
+    __slots__ = ("_schema", "_values")
+
+    def __init__(self, schema, values):
+        """
+        Inputs:
+          schema - Dictionary mapping field names to positions in values
+          values - Tuple of field values
+        """
+        self._schema = schema
+        self._values = values
+
+    def __getitem__(self, field):
+        return self._values[self._schema[field]]
+
+    def __contains__(self, field):
+        return field in self._schema
+
+    def __iter__(self):
+        return iter(self._schema)
+
+    def __len__(self):
+        return len(self._schema)
+
+    def __repr__(self):
+        return "CsvRow({!r})".format(dict(self))
+
+
+def read_csv_as_compact_nested_dict(filename, keyfield, separator, quote):
+    """
+    Inputs:
+      filename  - Name of CSV file
+      keyfield  - Field to use as key for rows
+      separator - Character that separates fields
+      quote     - Character used to optionally quote fields
+
+    Output:
+      Returns the same dictionary as read_csv_as_nested_dict, except
+      that the rows are CsvRow objects sharing a single field mapping
+      instead of one dictionary per row.  As with csv.DictReader, missing
+      trailing values are None and values beyond the header are listed
+      under the key None.
+    """
+    table = {}
+    with open(filename, newline='') as csvfile:
+        csvreader = csv.reader(csvfile, delimiter=separator, quotechar=quote)
+        header = next(csvreader, [])
+        schema = {field: position for position, field in enumerate(header)}
+        width = len(header)
+        extra_schema = dict(schema)
+        extra_schema[None] = width
+        padding = (None,) * width
+        keyposition = schema[keyfield]
+        for row in csvreader:
+            if not row:
+                continue
+            if len(row) > width:
+                table[row[keyposition]] = CsvRow(extra_schema, tuple(row[:width]) + (row[width:],))
+                continue
+            values = tuple(row)
+            if len(values) < width:
+                values += padding[len(values):]
+            table[values[keyposition]] = CsvRow(schema, values)
+    return table
+
+
+# Parsed GDP datasets keyed by file and load parameters
+_GDP_CACHE = {}
+
+
+def file_signature(filename):
+    """
+    Inputs:
+      filename - Name of a file on disk
+
+    Output:
+      Returns a tuple (modification time in ns, size in bytes) that
+      changes whenever the contents of the file are replaced.
+    """
+    stat = os.stat(filename)
+    return stat.st_mtime_ns, stat.st_size
+
+
+def normalize_country_name(name):
+    """
+    Inputs:
+      name - Country name
+
+    Output:
+      Returns the form of name used to compare country names without
+      regard to case.
+    """
+    return name.casefold()
+
+
+def build_name_index(plot_countries):
+    """
+    Inputs:
+      plot_countries - Dictionary whose keys are plot library country codes
+                       and values are the corresponding country name
+
+    Output:
+      A dictionary mapping each normalized country name to the first
+      code in plot_countries with that name.
+    """
+    index = {}
+    for code, plot_country_name in plot_countries.items():
+        index.setdefault(normalize_country_name(plot_country_name), code)
+    return index
+
+
+def reconcile_countries_by_name(plot_countries, gdp_countries, name_index=None):
     """
     Inputs:
       plot_countries - Dictionary whose keys are plot library country codes
                        and values are the corresponding country name
       gdp_countries  - Dictionary whose keys are country names used in GDP data
+      name_index     - Optional result of build_name_index(plot_countries),
+                       to reuse across calls
 
     Output:
       A tuple containing a dictionary and a set.  The dictionary maps
@@ -47,17 +197,138 @@ def reconcile_countries_by_name(plot_countries, gdp_countries):
       gdp_countries. The set contains the country codes from
       plot_countries that were not found in gdp_countries.
     """
+    if name_index is None:
+        name_index = build_name_index(plot_countries)
     matched_countries = {}
-    unmatched_codes = set(plot_countries.keys())
-    for gdp_country_name in gdp_countries.keys():
-        for code, plot_country_name in plot_countries.items():
-            if gdp_country_name.lower() == plot_country_name.lower():
-                matched_countries[code] = gdp_country_name
-                unmatched_codes.discard(code)
-                break
+    for gdp_country_name in gdp_countries:
+        code = name_index.get(normalize_country_name(gdp_country_name))
+        if code is not None:
+            matched_countries[code] = gdp_country_name
+    unmatched_codes = set(plot_countries).difference(matched_countries)
     return matched_countries, unmatched_codes
 
 
+class GdpMatrix:
+    """
+    GDP table held as float columns, one per requested year field, with
+    the country rows in table order.  The cells of the table are copied
+    into an object array on first use and a column is parsed from it the
+    first time its year is requested.  Requires NumPy.
+    """
+
+    def __init__(self, table):
+        """
+        Inputs:
+          table - Dictionary mapping country names to the CsvRow rows
+                  returned by read_csv_as_compact_nested_dict
+        """
+        self._rows = list(table.values())
+        self._cells = None
+        self._columns = {}
+        self.positions = {name: position for position, name in enumerate(table)}
+
+    def _cell_array(self):
+        """
+        Output:
+          Returns a two-dimensional object array of the header fields of
+          every row, building it on first use.
+        """
+        if self._cells is None:
+            # Every row shares the header's field positions, so the value
+            # tuples are sliced directly rather than read field by field
+            schema = self._rows[0]._schema
+            width = 1 + max(position for field, position in schema.items() if field is not None)
+            self._cells = np.array([row._values[:width] for row in self._rows], dtype=object)
+        return self._cells
+
+    def column(self, year):
+        """
+        Inputs:
+          year - String year field
+
+        Output:
+          Returns a tuple of an array of the GDP values of every row for
+          year, with NaN where a value is empty or not a number, and a
+          boolean array that is True where the value was parsed, or None
+          if the table has no year field.
+        """
+        if year not in self._columns:
+            column = None
+            if self._rows and year in self._rows[0]:
+                cells = self._cell_array()[:, self._rows[0]._schema[year]]
+                # Missing trailing values are None, which astype would
+                # turn into NaN rather than reject
+                parsed = np.not_equal(cells, '') & np.not_equal(cells, None)
+                try:
+                    # astype calls float() on each cell, but in C
+                    column = (np.where(parsed, cells, 'nan').astype(np.float64), parsed)
+                except (TypeError, ValueError):
+                    column = self._parse_cells(cells, parsed)
+            self._columns[year] = column
+        return self._columns[year]
+
+    @staticmethod
+    def _parse_cells(cells, parsed):
+        """
+        Converts cells one at a time, for columns holding a value that is
+        not a number or a missing value, clearing parsed where a cell
+        fails to convert.
+        """
+        values = np.empty(len(cells), dtype=np.float64)
+        for position, cell in enumerate(cells.tolist()):
+            try:
+                values[position] = float(cell)
+            except (TypeError, ValueError):
+                values[position] = math.nan
+                parsed[position] = False
+        return values, parsed
+
+
+class GdpDataset:
+    """
+    GDP table parsed once from the file described by a GDP data
+    information dictionary, together with its GdpMatrix once built.
+    """
+
+    def __init__(self, gdpinfo):
+        """
+        Inputs:
+          gdpinfo - A GDP information dictionary
+        """
+        self.table = read_csv_as_compact_nested_dict(gdpinfo['gdpfile'], gdpinfo['country_name'],
+                                                     gdpinfo['separator'], gdpinfo['quote'])
+        self._matrix = None
+
+    def get_matrix(self):
+        """
+        Output:
+          Returns the GdpMatrix of the table, building it on first use.
+          Requires NumPy.
+        """
+        if self._matrix is None:
+            self._matrix = GdpMatrix(self.table)
+        return self._matrix
+
+
+def load_gdp_dataset(gdpinfo):
+    """
+    Inputs:
+      gdpinfo - A GDP information dictionary
+
+    Output:
+      Returns the GdpDataset for the GDP file in gdpinfo, parsing the
+      file only if it has not been loaded yet or has changed on disk
+      since it was loaded.
+    """
+    filename = gdpinfo['gdpfile']
+    key = (os.path.abspath(filename), gdpinfo['country_name'], gdpinfo['separator'], gdpinfo['quote'])
+    signature = file_signature(filename)
+    entry = _GDP_CACHE.get(key)
+    if entry is None or entry[0] != signature:
+        entry = _GDP_CACHE[key] = (signature, GdpDataset(gdpinfo))
+    return entry[1]
+
+
 def build_map_dict_by_name(gdpinfo, plot_countries, year):
     """
     Inputs:
@@ -76,75 +347,510 @@ def build_map_dict_by_name(gdpinfo, plot_countries, year):
       have no GDP data for the specified year.
     """
 
-    # Initialize empty dictionaries and sets
-    gdp_map = {}
-    missing_countries = set()
-    no_data_countries = set()
+    return build_map_dicts_by_name(gdpinfo, plot_countries, [year])[str(year)]
 
-    # Read the GDP data file for the given year
-    filename = gdpinfo['gdpfile']
-    separator = gdpinfo['separator']
-    quote = gdpinfo['quote']
-    country_name = gdpinfo['country_name']
-    gdp_data = read_csv_as_nested_dict(filename,country_name, separator, quote)
+
+def build_map_dicts_by_name(gdpinfo, plot_countries, years):
+    """
+    Inputs:
+      gdpinfo        - A GDP information dictionary
+      plot_countries - Dictionary whose keys are plot library country codes
+                       and values are the corresponding country name
+      years          - List or range of years to create GDP mappings for
+
+    Output:
+      A dictionary mapping each year, as a string, to the tuple that
+      build_map_dict_by_name returns for that year.  Each country of
+      plot_countries is looked up in the GDP data once for all years.
+    """
+    years = [str(year) for year in years]
+    dataset = load_gdp_dataset(gdpinfo)
+    if load_numpy() is not None:
+        return map_dicts_from_matrix(dataset.get_matrix(), plot_countries, years)
+
+    results = {year: ({}, set(), set()) for year in years}
+
+    # Look up the GDP data table, parsed once for all years
+    gdp_data = dataset.table
 
     # Iterate over the countries in plot_countries
     for code, name in plot_countries.items():
 
         # Check if the country is in the GDP data file
         if name not in gdp_data:
-            missing_countries.add(code)
+            for year in years:
+                results[year][1].add(code)
             continue
+        gdp_row = gdp_data[name]
+
+        for year in years:
+            gdp_map, _, no_data_countries = results[year]
+
+            # Get the GDP value for the given year
+            gdp_year = gdp_row.get(year, None)
+
+            # Check if there is no GDP data for the given year
+            if gdp_year is None or gdp_year == '':
+                no_data_countries.add(code)
+                continue
+
+            # Convert GDP value to a float and calculate the logarithm
+            try:
+                gdp_value = float(gdp_year)
+                gdp_map[code] = math.log10(gdp_value)
+            except ValueError:
+                no_data_countries.add(code)
+
+    return results
+
+
+def map_dicts_from_matrix(matrix, plot_countries, years):
+    """
+    Inputs:
+      matrix         - GdpMatrix of the GDP data
+      plot_countries - Dictionary whose keys are plot library country codes
+                       and values are the corresponding country name
+      years          - List of string years to create GDP mappings for
 
-        # Get the GDP value for the given year
-        gdp_year = gdp_data[name].get(year, None)
+    Output:
+      The dictionary build_map_dicts_by_name returns, computed with
+      whole-column operations on matrix.
+    """
+    missing_countries = set()
+    found_codes = []
+    found_rows = []
+    for code, name in plot_countries.items():
+        position = matrix.positions.get(name)
+        if position is None:
+            missing_countries.add(code)
+        else:
+            found_codes.append(code)
+            found_rows.append(position)
+    found_rows = np.array(found_rows, dtype=np.intp)
 
-        # Check if there is no GDP data for the given year
-        if gdp_year is None or gdp_year == '':
-            no_data_countries.add(code)
+    results = {}
+    for year in years:
+        column = matrix.column(year)
+        if column is None:
+            results[year] = ({}, set(missing_countries), set(found_codes))
             continue
+        values = column[0][found_rows]
+        # Values that are empty, not numbers or not positive have no data;
+        # a literal NaN parses and maps to NaN, as in the per-country path
+        with np.errstate(invalid='ignore'):
+            has_data = column[1][found_rows] & ~(values <= 0)
+        # math.log10 keeps results bit-identical to the per-country path;
+        # NumPy's log10 can differ in the last place
+        gdp_map = dict(zip(compress(found_codes, has_data.tolist()),
+                           map(math.log10, values[has_data].tolist())))
+        no_data_countries = set(compress(found_codes, (~has_data).tolist()))
+        results[year] = (gdp_map, set(missing_countries), no_data_countries)
+    return results
+
+
+# Bump when the rendering code changes so stale cached images are not reused
+RENDER_CACHE_VERSION = 1
+
+
+class RenderCache:
+    """
+    A size-bounded directory of rendered SVG files, each named by a
+    digest of everything that went into the image.  Once the files
+    take more than max_bytes, the least recently used ones are deleted.
+    Recency survives restarts through the modification times of the
+    files.
+    """
+
+    def __init__(self, directory, max_bytes=64 * 2 ** 20):
+        """
+        Inputs:
+          directory - Directory holding the cached files, created if needed
+          max_bytes - Maximum total size of the cached files
+        """
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._sizes = OrderedDict()
+        self._total = 0
+        os.makedirs(directory, exist_ok=True)
+        found = []
+        for entry in os.scandir(directory):
+            if entry.name.endswith(".svg") and entry.is_file():
+                stat = entry.stat()
+                found.append((stat.st_mtime_ns, entry.name[:-len(".svg")], stat.st_size))
+        for _, key, size in sorted(found):
+            self._sizes[key] = size
+            self._total += size
+        self._evict()
+
+    def _path(self, key):
+        return os.path.join(self.directory, key + ".svg")
+
+    def fetch(self, key, output_file):
+        """
+        Inputs:
+          key         - Render key from render_key
+          output_file - Name of the file to write the cached image to
+
+        Output:
+          Returns True, after copying the cached image to output_file,
+          if key is in the cache, and False otherwise.
+        """
+        if key in self._sizes:
+            path = self._path(key)
+            try:
+                shutil.copyfile(path, output_file)
+                os.utime(path)
+            except FileNotFoundError:
+                self._total -= self._sizes.pop(key)
+            else:
+                self._sizes.move_to_end(key)
+                self.hits += 1
+                return True
+        self.misses += 1
+        return False
+
+    def store(self, key, rendered_file):
+        """
+        Inputs:
+          key           - Render key from render_key
+          rendered_file - Name of the freshly rendered image
+
+        Action:
+          Copies rendered_file into the cache under key and evicts the
+          least recently used images until the cache fits in max_bytes.
+          Images larger than max_bytes are not cached.
+        """
+        size = os.path.getsize(rendered_file)
+        if size > self.max_bytes:
+            return
+        path = self._path(key)
+        shutil.copyfile(rendered_file, path + ".tmp")
+        os.replace(path + ".tmp", path)
+        self._total += size - self._sizes.pop(key, 0)
+        self._sizes[key] = size
+        self._evict()
+
+    def _evict(self):
+        while self._total > self.max_bytes:
+            evicted, evicted_size = self._sizes.popitem(last=False)
+            self._total -= evicted_size
+            try:
+                os.remove(self._path(evicted))
+            except FileNotFoundError:
+                pass
+
+    def stats(self):
+        """
+        Output:
+          Returns a dictionary with the hit and miss counts and the
+          number and total size of the cached images.
+        """
+        return {"hits": self.hits, "misses": self.misses,
+                "entries": len(self._sizes), "bytes": self._total}
+
+
+# RenderCache used by the render functions, or None to always render
+_RENDER_CACHE = None
+
+
+def set_render_cache(directory, max_bytes=64 * 2 ** 20):
+    """
+    Inputs:
+      directory - Directory to cache rendered images in, or None to
+                  turn the render cache off
+      max_bytes - Maximum total size of the cached images
+
+    Output:
+      Returns the new RenderCache, or None if it was turned off.
+    """
+    global _RENDER_CACHE
+    _RENDER_CACHE = None if directory is None else RenderCache(directory, max_bytes)
+    return _RENDER_CACHE
+
+
+def render_key(kind, *parts):
+    """
+    Inputs:
+      kind  - String naming the kind of image
+      parts - Values that determine the image, made of strings,
+              numbers, None, tuples and lists
+
+    Output:
+      Returns a hexadecimal SHA-256 digest of kind and parts.
+    """
+    return hashlib.sha256(repr((RENDER_CACHE_VERSION, kind) + parts).encode()).hexdigest()
+
+
+def map_render_key(map_data, year):
+    """
+    Inputs:
+      map_data - Tuple returned by build_map_dict_by_name for year
+      year     - String year of data
+
+    Output:
+      Returns the render key of the world map of map_data for year.
+    """
+    gdp_map, missing_countries, no_data_countries = map_data
+    return render_key("world_map_by_name", str(year), list(gdp_map.items()),
+                      sorted(missing_countries), sorted(no_data_countries))
+
+
+def render_map_svg(map_data, year, map_file):
+    """
+    Inputs:
+      map_data - Tuple returned by build_map_dict_by_name for year
+      year     - String year of data
+      map_file - String that is the output map file name
+
+    Output:
+      Returns map_file.
+
+    Action:
+      Creates a world map plot of map_data and outputs it to a file
+      named by map_file.
+    """
+    import pygal
+
+    gdp_map, missing_countries, no_data_countries = map_data
+    worldmap = pygal.maps.world.World()
+    worldmap.title = "GDP by country for {} (log scale), unified by common country NAME".format(year)
+    worldmap.add("GDP for {}".format(year), gdp_map)
+    worldmap.add("Missing from World Bank Data", missing_countries)
+    worldmap.add("No GDP Data", no_data_countries)
+    worldmap.render_to_file(map_file)
+    return map_file
+
 
-        # Convert GDP value to a float and calculate the logarithm
+def render_world_map(gdpinfo, plot_countries, year, map_file):
+    """
+    Inputs:
+      gdpinfo        - A GDP information dictionary
+      plot_countries - Dictionary whose keys are plot library country codes
+                       and values are the corresponding country name
+      year           - String year to create GDP mapping for
+      map_file       - Name of output file to create
+
+    Output:
+      Returns None.
+
+    Action:
+      Creates a world map plot of the GDP data for the given year and
+      writes it to a file named by map_file.
+      If a render cache is set, an identical earlier map is copied from
+      it instead of being rendered again.
+    """
+    map_data = build_map_dict_by_name(gdpinfo, plot_countries, year)
+    cache = _RENDER_CACHE
+    if cache is not None:
+        key = map_render_key(map_data, year)
+        if cache.fetch(key, map_file):
+            return
+    render_map_svg(map_data, year, map_file)
+    if cache is not None:
+        cache.store(key, map_file)
+
+
+def render_world_maps(gdpinfo, plot_countries, years, map_file_format, processes=None):
+    """
+    Inputs:
+      gdpinfo         - A GDP information dictionary
+      plot_countries  - Dictionary whose keys are plot library country codes
+                        and values are the corresponding country name
+      years           - List or range of years to render
+      map_file_format - Output file name with a {} placeholder for the year
+      processes       - Number of worker processes, None for one per CPU
+                        or 1 to render in this process
+
+    Output:
+      Returns the list of map files written, in the order of years.
+
+    Action:
+      Computes the GDP mappings of all years in one pass and renders one
+      world map per year, in parallel across a process pool.  If a
+      render cache is set, maps identical to earlier ones are copied
+      from it and only the others are rendered.
+    """
+    map_dicts = build_map_dicts_by_name(gdpinfo, plot_countries, years)
+    years = list(map_dicts)
+    map_files = [map_file_format.format(year) for year in years]
+    map_data = [map_dicts[year] for year in years]
+    pending = range(len(years))
+    cache = _RENDER_CACHE
+    if cache is not None:
+        keys = [map_render_key(data, year) for data, year in zip(map_data, years)]
+        pending = [index for index in pending if not cache.fetch(keys[index], map_files[index])]
+    args = ([map_data[index] for index in pending], [years[index] for index in pending],
+            [map_files[index] for index in pending])
+    if processes == 1:
+        list(map(render_map_svg, *args))
+    elif pending:
+        from concurrent.futures import ProcessPoolExecutor
+
+        with ProcessPoolExecutor(max_workers=processes) as executor:
+            list(executor.map(render_map_svg, *args))
+    if cache is not None:
+        for index in pending:
+            cache.store(keys[index], map_files[index])
+    return map_files
+
+
+def test_render_world_map():
+    """
+    Test the project code for several years.
+    """
+    gdpinfo = {
+        "gdpfile": "isp_gdp.csv",
+        "separator": ",",
+        "quote": '"',
+        "min_year": 1960,
+        "max_year": 2015,
+        "country_name": "Country Name",
+        "country_code": "Country Code"
+    }
+
+    import pygal
+
+    # Get pygal country code map
+    pygal_countries = pygal.maps.world.COUNTRIES
+
+    # 1960, 1980, 2000 and 2010
+    render_world_maps(gdpinfo, pygal_countries, [1960, 1980, 2000, 2010],
+                      "isp_gdp_world_name_{}.svg")
+
+
+def write_synthetic_gdp_file(filename, numcountries, min_year=1960, max_year=2015, seed=0):
+    """
+    Inputs:
+      filename     - Name of CSV file to write
+      numcountries - Number of country rows
+      min_year     - First year column
+      max_year     - Last year column
+      seed         - Seed for the random number generator
+
+    Output:
+      Writes a World Bank style GDP file with one row per country and
+      one column per year, leaving about one value in ten empty, and
+      returns the GDP data information dictionary describing it.
+    """
+    rng = random.Random(seed)
+    with open(filename, "w", newline='') as csvfile:
+        writer = csv.writer(csvfile, quoting=csv.QUOTE_ALL)
+        writer.writerow(["Country Name", "Country Code", "Indicator Name", "Indicator Code"] +
+                        [str(year) for year in range(min_year, max_year + 1)])
+        for country in range(numcountries):
+            values = ["" if rng.random() < 0.1 else repr(rng.uniform(1e8, 1e13))
+                      for _ in range(min_year, max_year + 1)]
+            writer.writerow(["Country {}".format(country), "C{:05d}".format(country),
+                             "GDP (current US$)", "NY.GDP.MKTP.CD"] + values)
+    return {
+        "gdpfile": filename,
+        "separator": ",",
+        "quote": '"',
+        "min_year": min_year,
+        "max_year": max_year,
+        "country_name": "Country Name",
+        "country_code": "Country Code"
+    }
+
+
+def benchmark_build_map_dicts(numcountries=2000, min_year=1960, max_year=2015, repeat=5):
+    """
+    Inputs:
+      numcountries - Number of countries in the synthetic GDP file
+      min_year     - First year column
+      max_year     - Last year column
+      repeat       - Number of timed calls of each kind
+
+    Output:
+      Times build_map_dicts_by_name for every year of a synthetic GDP
+      file with the per-country path, with a freshly built GdpMatrix and
+      with one whose columns are already parsed, and prints and returns
+      a dictionary mapping "per-country", "matrix cold" and "matrix
+      warm" to the best time of each in seconds.  Returns None if NumPy
+      is not installed.
+    """
+    global np
+    numpy_module = load_numpy()
+    if numpy_module is None:
+        print("NumPy is not installed")
+        return None
+
+    timings = {"per-country": [], "matrix cold": [], "matrix warm": []}
+    with tempfile.TemporaryDirectory() as directory:
+        gdpinfo = write_synthetic_gdp_file(os.path.join(directory, "gdp.csv"), numcountries,
+                                           min_year, max_year)
+        plot_countries = {"c{}".format(country): "Country {}".format(country)
+                          for country in range(numcountries)}
+        years = range(min_year, max_year + 1)
+        dataset = load_gdp_dataset(gdpinfo)
         try:
-            gdp_value = float(gdp_year)
-            gdp_map[code] = math.log10(gdp_value)
-        except ValueError:
-            no_data_countries.add(code)
-            continue
+            for _ in range(repeat):
+                for kind, times in timings.items():
+                    np = None if kind == "per-country" else numpy_module
+                    if kind == "matrix cold":
+                        dataset._matrix = None
+                    start = time.perf_counter()
+                    build_map_dicts_by_name(gdpinfo, plot_countries, years)
+                    times.append(time.perf_counter() - start)
+        finally:
+            np = numpy_module
+    for key in [key for key in _GDP_CACHE if key[0].startswith(directory)]:
+        del _GDP_CACHE[key]
 
-    # Return the dictionary and sets
-    return gdp_map, missing_countries, no_data_countries
-
-
-# def test_render_world_map():
-#     """
-#     Test the project code for several years.
-#     """
-#     gdpinfo = {
-#         "gdpfile": "isp_gdp.csv",
-#         "separator": ",",
-#         "quote": '"',
-#         "min_year": 1960,
-#         "max_year": 2015,
-#         "country_name": "Country Name",
-#         "country_code": "Country Code"
-#     }
-#
-#     # Get pygal country code map
-#     pygal_countries = pygal.maps.world.COUNTRIES
-#
-#     # 1960
-#     # render_world_map(gdpinfo, pygal_countries, "1960", "isp_gdp_world_name_1960.svg")
-#     #
-#     # # 1980
-#     # render_world_map(gdpinfo, pygal_countries, "1980", "isp_gdp_world_name_1980.svg")
-#     #
-#     # # 2000
-#     # render_world_map(gdpinfo, pygal_countries, "2000", "isp_gdp_world_name_2000.svg")
-#     #
-#     # # 2010
-#     # render_world_map(gdpinfo, pygal_countries, "2010", "isp_gdp_world_name_2010.svg")
-#     #
+    results = {kind: min(times) for kind, times in timings.items()}
+    print("{} countries x {} years: per-country {:.3f} s, matrix cold {:.3f} s, "
+          "matrix warm {:.3f} s".format(numcountries, len(years), results["per-country"],
+                                        results["matrix cold"], results["matrix warm"]))
+    return results
+
+
+def benchmark_import_time():
+    """
+    Output:
+      Imports this module in a fresh interpreter with -X importtime and
+      prints and returns a tuple of the cumulative import time of the
+      module in microseconds, whether pygal was imported with it, the
+      number of characters written to stdout and the list of data files
+      opened while importing it.
+
+    Action:
+      Raises AssertionError if importing the module opens a data file
+      or writes to stdout.
+    """
+    directory = os.path.dirname(os.path.abspath(__file__))
+    module = os.path.splitext(os.path.basename(__file__))[0]
+    probe = "\n".join([
+        "import contextlib, io, os, sys",
+        "opened = []",
+        "def audit(event, args):",
+        "    if (event == 'open' and isinstance(args[0], str)",
+        "            and not args[0].endswith(('.py', '.pyc'))):",
+        "        opened.append(os.path.basename(args[0]))",
+        "sys.addaudithook(audit)",
+        "output = io.StringIO()",
+        "with contextlib.redirect_stdout(output):",
+        "    import {}".format(module),
+        "print('pygal' in sys.modules, len(output.getvalue()), *opened, sep='\\t')",
+    ])
+    completed = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", probe],
+        cwd=directory, capture_output=True, text=True, check=True)
+    cumulative = None
+    for line in completed.stderr.splitlines():
+        fields = line.split("|")
+        if len(fields) == 3 and fields[2].strip() == module:
+            cumulative = int(fields[1])
+    report = completed.stdout.rstrip("\n").split("\t")
+    pygal_imported = report[0] == "True"
+    printed = int(report[1])
+    opened = report[2:]
+    print("import {}: {} us cumulative, pygal imported: {}, "
+          "{} characters printed, files opened: {}".format(
+              module, cumulative, pygal_imported, printed, opened))
+    assert not opened and not printed, "importing {} has side effects".format(module)
+    return cumulative, pygal_imported, printed, opened
 
 
 # Make sure the following call to test_render_world_map is commented
@@ -152,3 +858,8 @@ def build_map_dict_by_name(gdpinfo, plot_countries, year):
 #
 # test_render_world_map()
 
+
+# Uncomment to run the benchmarks.
+
+# benchmark_build_map_dicts()
+# benchmark_import_time()
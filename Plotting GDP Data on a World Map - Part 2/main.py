@@ -7,8 +7,38 @@ about the expected behavior of the program.
 """
 
 import csv
+import hashlib
 import math
-import pygal
+import os
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from collections import OrderedDict
+from collections.abc import Mapping
+from itertools import compress
+
+# NumPy module, imported on first use: False until then, None if it is
+# not installed
+np = False
+
+
+def load_numpy():
+    """
+    Output:
+      Returns the numpy module, importing it on first use, or None if
+      NumPy is not installed.
+    """
+    global np
+    if np is False:
+        try:
+            import numpy
+            np = numpy
+        except ImportError:
+            np = None
+    return np
 
 
 def read_csv_as_nested_dict(filename, keyfield, separator, quote):
@@ -34,6 +64,79 @@ def read_csv_as_nested_dict(filename, keyfield, separator, quote):
     return table
 
 
+class CsvRow(Mapping):
+    """
+    Read-only row of a CSV file that shares one field name to position
+    mapping with every other row of the same file and stores only a
+    tuple of its own values.  Supports row[field], field in row, get,
+    keys, items and comparison with dictionaries.
+    """
+
+    __slots__ = ("_schema", "_values")
+
+    def __init__(self, schema, values):
+        """
+        Inputs:
+          schema - Dictionary mapping field names to positions in values
+          values - Tuple of field values
+        """
+        self._schema = schema
+        self._values = values
+
+    def __getitem__(self, field):
+        return self._values[self._schema[field]]
+
+    def __contains__(self, field):
+        return field in self._schema
+
+    def __iter__(self):
+        return iter(self._schema)
+
+    def __len__(self):
+        return len(self._schema)
+
+    def __repr__(self):
+        return "CsvRow({!r})".format(dict(self))
+
+
+def read_csv_as_compact_nested_dict(filename, keyfield, separator, quote):
+    """
+    Inputs:
+      filename  - Name of CSV file
+      keyfield  - Field to use as key for rows
+      separator - Character that separates fields
+      quote     - Character used to optionally quote fields
+
+    Output:
+      Returns the same dictionary as read_csv_as_nested_dict, except
+      that the rows are CsvRow objects sharing a single field mapping
+      instead of one dictionary per row.  As with csv.DictReader, missing
+      trailing values are None and values beyond the header are listed
+      under the key None.
+    """
+    table = {}
+    with open(filename, newline='') as csvfile:
+        csvreader = csv.reader(csvfile, delimiter=separator, quotechar=quote)
+        header = next(csvreader, [])
+        schema = {field: position for position, field in enumerate(header)}
+        width = len(header)
+        extra_schema = dict(schema)
+        extra_schema[None] = width
+        padding = (None,) * width
+        keyposition = schema[keyfield]
+        for row in csvreader:
+            if not row:
+                continue
+            if len(row) > width:
+                table[row[keyposition]] = CsvRow(extra_schema, tuple(row[:width]) + (row[width:],))
+                continue
+            values = tuple(row)
+            if len(values) < width:
+                values += padding[len(values):]
+            table[values[keyposition]] = CsvRow(schema, values)
+    return table
+
+
 def read_csv_as_dict(filename, separator, quote="'"):
     """
     Reads the CSV file filename into a list of dictionaries where the
@@ -78,20 +181,288 @@ def build_country_code_converter(codeinfo):
     return converter
 
 
-def reconcile_countries_by_code(codeinfo, plot_countries, gdp_countries):
-    # Create a dictionary to hold the mapping of plot_countries codes to gdp_countries codes
+# Tables and indexes loaded from files, keyed by file and load parameters
+_FILE_CACHE = {}
+
+
+def file_signature(filename):
+    """
+    Inputs:
+      filename - Name of a file on disk
+
+    Output:
+      Returns a tuple (modification time in ns, size in bytes) that
+      changes whenever the contents of the file are replaced.
+    """
+    stat = os.stat(filename)
+    return stat.st_mtime_ns, stat.st_size
+
+
+def load_cached(key, filename, loader):
+    """
+    Inputs:
+      key      - Hashable key identifying what is loaded from filename
+      filename - Name of the file the loaded value is built from
+      loader   - Function of no arguments that builds the value
+
+    Output:
+      Returns the value built by loader.  The value is built at most
+      once per version of filename; it is rebuilt when the modification
+      time or size of the file changes.
+    """
+    signature = file_signature(filename)
+    entry = _FILE_CACHE.get(key)
+    if entry is None or entry[0] != signature:
+        entry = _FILE_CACHE[key] = (signature, loader())
+    return entry[1]
+
+
+def build_code_index(codes):
+    """
+    Inputs:
+      codes - Iterable of country codes
+
+    Output:
+      A dictionary mapping each casefolded code to the code as given.
+      Codes that only differ in case are resolved as in build_row_index,
+      so both indexes pick the same GDP row.
+    """
+    return build_row_index({code: code for code in codes})
+
+
+def load_code_converter_index(codeinfo):
+    """
+    Inputs:
+      codeinfo - A country code information dictionary
+
+    Output:
+      A dictionary mapping casefolded plot country codes to world bank
+      country codes, built from build_country_code_converter once per
+      version of the code file.
+    """
+    key = ("converter", os.path.abspath(codeinfo['codefile']), codeinfo['separator'],
+           codeinfo['quote'], codeinfo['plot_codes'], codeinfo['data_codes'])
+    return load_cached(key, codeinfo['codefile'], lambda: {
+        plot_code.casefold(): data_code
+        for plot_code, data_code in build_country_code_converter(codeinfo).items()})
+
+
+def build_row_index(table):
+    """
+    Inputs:
+      table - Dictionary mapping country codes to rows
+
+    Output:
+      A dictionary mapping each casefolded code to its row.  If several
+      codes only differ in case, the upper case code is preferred, then
+      the first one in table.
+    """
+    index = {}
+    for code, row in table.items():
+        folded = code.casefold()
+        if folded not in index or code == code.upper():
+            index[folded] = row
+    return index
+
+
+def load_code_table(codeinfo):
+    """
+    Inputs:
+      codeinfo - A country code information dictionary
+
+    Output:
+      A dictionary mapping plot country codes to rows of the code file,
+      parsed once per version of the code file.
+    """
+    key = ("codes", os.path.abspath(codeinfo['codefile']), codeinfo['plot_codes'],
+           codeinfo['separator'], codeinfo['quote'])
+    return load_cached(key, codeinfo['codefile'], lambda: read_csv_as_compact_nested_dict(
+        codeinfo['codefile'], codeinfo['plot_codes'], codeinfo['separator'], codeinfo['quote']))
+
+
+def load_gdp_code_index(gdpinfo):
+    """
+    Inputs:
+      gdpinfo - A GDP information dictionary
+
+    Output:
+      A dictionary mapping casefolded country codes to rows of the GDP
+      file, parsed and indexed once per version of the GDP file.
+    """
+    key = ("gdp codes", os.path.abspath(gdpinfo['gdpfile']), gdpinfo['country_code'],
+           gdpinfo['separator'], gdpinfo['quote'])
+    return load_cached(key, gdpinfo['gdpfile'], lambda: build_row_index(
+        read_csv_as_compact_nested_dict(gdpinfo['gdpfile'], gdpinfo['country_code'],
+                                        gdpinfo['separator'], gdpinfo['quote'])))
+
+
+class GdpMatrix:
+    """
+    GDP table held as float columns, one per requested year field, with
+    the country rows in table order.  The cells of the table are copied
+    into an object array on first use and a column is parsed from it the
+    first time its year is requested.  Requires NumPy.
+    """
+
+    def __init__(self, table):
+        """
+        Inputs:
+          table - Dictionary mapping country codes to the CsvRow rows
+                  returned by read_csv_as_compact_nested_dict
+        """
+        self._rows = list(table.values())
+        self._cells = None
+        self._columns = {}
+        self.index = build_row_index({code: position for position, code in enumerate(table)})
+
+    def _cell_array(self):
+        """
+        Output:
+          Returns a two-dimensional object array of the header fields of
+          every row, building it on first use.
+        """
+        if self._cells is None:
+            # Every row shares the header's field positions, so the value
+            # tuples are sliced directly rather than read field by field
+            schema = self._rows[0]._schema
+            width = 1 + max(position for field, position in schema.items() if field is not None)
+            self._cells = np.array([row._values[:width] for row in self._rows], dtype=object)
+        return self._cells
+
+    def column(self, year):
+        """
+        Inputs:
+          year - String year field
+
+        Output:
+          Returns a tuple of an array of the GDP values of every row for
+          year, a boolean array that is True where the value is empty
+          and a boolean array that is True where it is not a number,
+          with NaN in the values array for both, or None if the table
+          has no year field.
+        """
+        if year not in self._columns:
+            column = None
+            if self._rows and year in self._rows[0]:
+                cells = self._cell_array()[:, self._rows[0]._schema[year]]
+                empty = np.equal(cells, "")
+                # Missing trailing values are None, which astype would
+                # turn into NaN rather than reject
+                invalid = np.equal(cells, None)
+                try:
+                    # astype calls float() on each cell, but in C
+                    column = (np.where(empty | invalid, "nan", cells).astype(np.float64),
+                              empty, invalid)
+                except (TypeError, ValueError):
+                    column = self._parse_cells(cells, empty)
+            self._columns[year] = column
+        return self._columns[year]
+
+    @staticmethod
+    def _parse_cells(cells, empty):
+        """
+        Converts cells one at a time, for columns holding a value that is
+        not a number or a missing value, and returns the tuple column
+        returns for them.
+        """
+        values = np.full(len(cells), math.nan)
+        invalid = np.zeros(len(cells), dtype=bool)
+        for position, gdp in enumerate(cells.tolist()):
+            if gdp == "":
+                continue
+            try:
+                values[position] = float(gdp)
+            except (TypeError, ValueError):
+                invalid[position] = True
+        return values, empty, invalid
+
+
+def load_gdp_matrix(gdpinfo):
+    """
+    Inputs:
+      gdpinfo - A GDP information dictionary
+
+    Output:
+      The GdpMatrix of the GDP file, parsed once per version of the file.
+    """
+    key = ("gdp matrix", os.path.abspath(gdpinfo['gdpfile']), gdpinfo['country_code'],
+           gdpinfo['separator'], gdpinfo['quote'])
+    return load_cached(key, gdpinfo['gdpfile'], lambda: GdpMatrix(
+        read_csv_as_compact_nested_dict(gdpinfo['gdpfile'], gdpinfo['country_code'],
+                                        gdpinfo['separator'], gdpinfo['quote'])))
+
+
+def map_dict_from_matrix(matrix, plot_countries, found_codes, found_rows, year):
+    """
+    Inputs:
+      matrix         - GdpMatrix of the GDP data
+      plot_countries - Dictionary mapping plot library country codes to country names
+      found_codes    - List of the plot codes that have a row in matrix
+      found_rows     - Array of the matrix rows of found_codes
+      year           - String year for which to create GDP mapping
+
+    Output:
+      The tuple build_map_dict_by_code returns for year, computed with
+      whole-column operations on matrix.
+    """
+    map_dict = {}
+    missing_countries = set(plot_countries.keys())
+    missing_years = set()
+
+    column = matrix.column(year)
+    if column is None:
+        missing_years.update(found_codes)
+        return map_dict, missing_countries, missing_years
+
+    values = column[0][found_rows]
+    empty = column[1][found_rows]
+    # A literal NaN is not empty and maps to NaN, as in the per-country path
+    with np.errstate(invalid='ignore'):
+        if column[2][found_rows].any() or (values <= 0).any():
+            raise ValueError("GDP values for {} must be positive numbers".format(year))
+
+    missing_countries.difference_update(found_codes)
+    missing_years.update(compress(found_codes, empty.tolist()))
+    # math.log keeps results bit-identical to the per-country path;
+    # NumPy's log can differ in the last place
+    map_dict.update(zip(compress(found_codes, (~empty).tolist()),
+                        [math.log(value, 10) for value in values[~empty].tolist()]))
+    return map_dict, missing_countries, missing_years
+
+
+def reconcile_countries_by_code(codeinfo, plot_countries, gdp_countries, gdp_index=None):
+    """
+    Inputs:
+      codeinfo       - A country code information dictionary
+      plot_countries - Dictionary whose keys are plot library country codes
+                       and values are the corresponding country name
+      gdp_countries  - Dictionary whose keys are country codes used in GDP data
+      gdp_index      - Optional result of build_code_index(gdp_countries),
+                       to reuse across calls
+
+    Output:
+      A tuple containing a dictionary and a set.  The dictionary maps
+      country codes from plot_countries to country codes from
+      gdp_countries.  The set contains the country codes from
+      plot_countries that did not have a country with a corresponding
+      code in gdp_countries.  Codes are compared without regard to case,
+      but are returned as they appear in plot_countries and
+      gdp_countries.
+    """
+    converter = load_code_converter_index(codeinfo)
+    if gdp_index is None:
+        gdp_index = build_code_index(gdp_countries)
+
+    # Join plot codes to data codes to GDP codes, one probe per table
     code_mapping = {}
-    # Create a set to hold the plot_countries codes that have no match in gdp_countries
     unmatched_codes = set()
-
-    # Loop through the plot_countries codes and find matches in gdp_countries
-    for plot_code, country_name in plot_countries.items():
-        for country in gdp_countries.values():
-            if country_name == country['Country Name']:
-                code_mapping[plot_code] = country['Country Code']
-    for plot_code in plot_countries.keys():
-        if plot_code not in code_mapping.keys():
+    for plot_code in plot_countries:
+        data_code = converter.get(plot_code.casefold())
+        gdp_code = gdp_index.get(data_code.casefold()) if data_code is not None else None
+        if gdp_code is None:
             unmatched_codes.add(plot_code)
+        else:
+            code_mapping[plot_code] = gdp_code
     return code_mapping, unmatched_codes
 
 
@@ -113,119 +484,498 @@ def build_map_dict_by_code(gdpinfo, codeinfo, plot_countries, year):
       have no GDP data for the specified year.
     """
 
-    gdp_dict = read_csv_as_nested_dict(gdpinfo["gdpfile"], gdpinfo["country_code"], gdpinfo["separator"],
-                                       gdpinfo["quote"])
-    code_dict = read_csv_as_nested_dict(codeinfo["codefile"], codeinfo['plot_codes'], codeinfo["separator"],
-                                        codeinfo["quote"])
+    return build_map_dicts_by_code(gdpinfo, codeinfo, plot_countries, [year])[str(year)]
 
-    map_dict = {}
-    missing_countries = set(plot_countries.keys())
-    missing_years = set()
 
-    for code in plot_countries:
-        country_name = plot_countries[code]
-        if country_name in code_dict:
-            country_code = code_dict[country_name]
-            if country_code[codeinfo['data_codes']].upper() in gdp_dict:
-                if year in gdp_dict[country_code[codeinfo['data_codes']].upper()]:
-                    gdp = gdp_dict[country_code[codeinfo['data_codes']].upper()][year]
-                    if gdp != "":
-                        map_dict[code] = math.log(float(gdp), 10)
-                        missing_countries.discard(code)
-                    else:
-                        missing_countries.discard(code)
-                        missing_years.add(code)
-                else:
-                    missing_years.add(code)
-            # else:
-            #     missing_years.add(code)
-            elif country_code[codeinfo['data_codes']].lower() in gdp_dict:
-                if year in gdp_dict[country_code[codeinfo['data_codes']].lower()]:
-                    gdp = gdp_dict[country_code[codeinfo['data_codes']].lower()][year]
-                    if gdp != "":
-                        map_dict[code] = math.log(float(gdp), 10)
-                        missing_countries.discard(code)
-                    else:
-                        missing_countries.discard(code)
-                        missing_years.add(code)
-                else:
-                    missing_years.add(code)
-            # else:
-            #     missing_years.add(code)
-            elif country_code[codeinfo['data_codes']] in gdp_dict:
-                if year in gdp_dict[country_code[codeinfo['data_codes']]]:
-                    gdp = gdp_dict[country_code[codeinfo['data_codes']]][year]
-                    if gdp != "":
-                        map_dict[code] = math.log(float(gdp), 10)
-                        missing_countries.discard(code)
-                    else:
-                        missing_countries.discard(code)
-                        missing_years.add(code)
-                else:
-                    missing_years.add(code)
-            # else:
-            #     missing_years.add(code)
-        else:
-            missing_countries.add(code)
+def build_map_dicts_by_code(gdpinfo, codeinfo, plot_countries, years):
+    """
+    Inputs:
+      gdpinfo        - A GDP information dictionary
+      codeinfo       - A country code information dictionary
+      plot_countries - Dictionary mapping plot library country codes to country names
+      years          - List or range of years for which to create GDP mappings
 
-    return map_dict, missing_countries, missing_years
+    Output:
+      A dictionary mapping each year, as a string, to the tuple that
+      build_map_dict_by_code returns for that year.  Each country of
+      plot_countries is joined to its GDP row once for all years.
+    """
+    years = [str(year) for year in years]
+    code_dict = load_code_table(codeinfo)
+    data_codes = codeinfo['data_codes']
+
+    if load_numpy() is not None:
+        # Join each plot code to its matrix row once, then work on columns
+        matrix = load_gdp_matrix(gdpinfo)
+        found_codes = []
+        found_rows = []
+        for code, country_name in plot_countries.items():
+            country_code = code_dict.get(country_name)
+            if country_code is None:
+                continue
+            position = matrix.index.get(country_code[data_codes].casefold())
+            if position is not None:
+                found_codes.append(code)
+                found_rows.append(position)
+        found_rows = np.array(found_rows, dtype=np.intp)
+        return {year: map_dict_from_matrix(matrix, plot_countries, found_codes, found_rows, year)
+                for year in years}
+
+    gdp_index = load_gdp_code_index(gdpinfo)
+    results = {year: ({}, set(plot_countries.keys()), set()) for year in years}
+
+    for code, country_name in plot_countries.items():
+        country_code = code_dict.get(country_name)
+        if country_code is None:
+            continue
+        gdp_row = gdp_index.get(country_code[data_codes].casefold())
+        if gdp_row is None:
+            continue
+        for year in years:
+            map_dict, missing_countries, missing_years = results[year]
+            if year not in gdp_row:
+                missing_years.add(code)
+                continue
+            missing_countries.discard(code)
+            gdp = gdp_row[year]
+            if gdp != "":
+                map_dict[code] = math.log(float(gdp), 10)
+            else:
+                missing_years.add(code)
+
+    return results
+
+
+# Bump when the rendering code changes so stale cached images are not reused
+RENDER_CACHE_VERSION = 1
+
+
+class RenderCache:
+    """
+    A size-bounded directory of rendered SVG files, each named by a
+    digest of everything that went into the image.  Once the files
+    take more than max_bytes, the least recently used ones are deleted.
+    Recency survives restarts through the modification times of the
+    files.
+    """
+
+    def __init__(self, directory, max_bytes=64 * 2 ** 20):
+        """
+        Inputs:
+          directory - Directory holding the cached files, created if needed
+          max_bytes - Maximum total size of the cached files
+        """
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._sizes = OrderedDict()
+        self._total = 0
+        os.makedirs(directory, exist_ok=True)
+        found = []
+        for entry in os.scandir(directory):
+            if entry.name.endswith(".svg") and entry.is_file():
+                stat = entry.stat()
+                found.append((stat.st_mtime_ns, entry.name[:-len(".svg")], stat.st_size))
+        for _, key, size in sorted(found):
+            self._sizes[key] = size
+            self._total += size
+        self._evict()
+
+    def _path(self, key):
+        return os.path.join(self.directory, key + ".svg")
+
+    def fetch(self, key, output_file):
+        """
+        Inputs:
+          key         - Render key from render_key
+          output_file - Name of the file to write the cached image to
+
+        Output:
+          Returns True, after copying the cached image to output_file,
+          if key is in the cache, and False otherwise.
+        """
+        if key in self._sizes:
+            path = self._path(key)
+            try:
+                shutil.copyfile(path, output_file)
+                os.utime(path)
+            except FileNotFoundError:
+                self._total -= self._sizes.pop(key)
+            else:
+                self._sizes.move_to_end(key)
+                self.hits += 1
+                return True
+        self.misses += 1
+        return False
+
+    def store(self, key, rendered_file):
+        """
+        Inputs:
+          key           - Render key from render_key
+          rendered_file - Name of the freshly rendered image
+
+        Action:
+          Copies rendered_file into the cache under key and evicts the
+          least recently used images until the cache fits in max_bytes.
+          Images larger than max_bytes are not cached.
+        """
+        size = os.path.getsize(rendered_file)
+        if size > self.max_bytes:
+            return
+        path = self._path(key)
+        shutil.copyfile(rendered_file, path + ".tmp")
+        os.replace(path + ".tmp", path)
+        self._total += size - self._sizes.pop(key, 0)
+        self._sizes[key] = size
+        self._evict()
+
+    def _evict(self):
+        while self._total > self.max_bytes:
+            evicted, evicted_size = self._sizes.popitem(last=False)
+            self._total -= evicted_size
+            try:
+                os.remove(self._path(evicted))
+            except FileNotFoundError:
+                pass
+
+    def stats(self):
+        """
+        Output:
+          Returns a dictionary with the hit and miss counts and the
+          number and total size of the cached images.
+        """
+        return {"hits": self.hits, "misses": self.misses,
+                "entries": len(self._sizes), "bytes": self._total}
+
+
+# RenderCache used by the render functions, or None to always render
+_RENDER_CACHE = None
+
+
+def set_render_cache(directory, max_bytes=64 * 2 ** 20):
+    """
+    Inputs:
+      directory - Directory to cache rendered images in, or None to
+                  turn the render cache off
+      max_bytes - Maximum total size of the cached images
+
+    Output:
+      Returns the new RenderCache, or None if it was turned off.
+    """
+    global _RENDER_CACHE
+    _RENDER_CACHE = None if directory is None else RenderCache(directory, max_bytes)
+    return _RENDER_CACHE
+
+
+def render_key(kind, *parts):
+    """
+    Inputs:
+      kind  - String naming the kind of image
+      parts - Values that determine the image, made of strings,
+              numbers, None, tuples and lists
+
+    Output:
+      Returns a hexadecimal SHA-256 digest of kind and parts.
+    """
+    return hashlib.sha256(repr((RENDER_CACHE_VERSION, kind) + parts).encode()).hexdigest()
+
+
+def map_render_key(map_data, year):
+    """
+    Inputs:
+      map_data - Tuple returned by build_map_dict_by_code for year
+      year     - String year of data
+
+    Output:
+      Returns the render key of the world map of map_data for year.
+    """
+    map_dict, missing_countries, missing_years = map_data
+    return render_key("world_map_by_code", str(year), list(map_dict.items()),
+                      sorted(missing_countries), sorted(missing_years))
+
+
+def render_map_svg(map_data, year, map_file):
+    """
+    Inputs:
+      map_data - Tuple returned by build_map_dict_by_code for year
+      year     - String year of data
+      map_file - String that is the output map file name
 
+    Output:
+      Returns map_file.
+
+    Action:
+      Creates a world map plot of map_data and outputs it to a file
+      named by map_file.
+    """
+    import pygal
+
+    map_dict, missing_countries, missing_years = map_data
+    worldmap = pygal.maps.world.World()
+    worldmap.title = "GDP by country for {} (log scale), unified by common country code".format(year)
+    worldmap.add("GDP for {}".format(year), map_dict)
+    worldmap.add("Missing from World Bank Data", missing_countries)
+    worldmap.add("No GDP Data", missing_years)
+    worldmap.render_to_file(map_file)
+    return map_file
+
+
+def render_world_map(gdpinfo, codeinfo, plot_countries, year, map_file):
+    """
+    Inputs:
+      gdpinfo        - A GDP information dictionary
+      codeinfo       - A country code information dictionary
+      plot_countries - Dictionary mapping plot library country codes to country names
+      year           - String year of data
+      map_file       - String that is the output map file name
+
+    Output:
+      Returns None.
+
+    Action:
+      Creates a world map plot of the GDP data in gdp_mapping and outputs
+      it to a file named by svg_filename.
+      If a render cache is set, an identical earlier map is copied from
+      it instead of being rendered again.
+    """
+    map_data = build_map_dict_by_code(gdpinfo, codeinfo, plot_countries, year)
+    cache = _RENDER_CACHE
+    if cache is not None:
+        key = map_render_key(map_data, year)
+        if cache.fetch(key, map_file):
+            return
+    render_map_svg(map_data, year, map_file)
+    if cache is not None:
+        cache.store(key, map_file)
+
+
+def render_world_maps(gdpinfo, codeinfo, plot_countries, years, map_file_format, processes=None):
+    """
+    Inputs:
+      gdpinfo         - A GDP information dictionary
+      codeinfo        - A country code information dictionary
+      plot_countries  - Dictionary mapping plot library country codes to country names
+      years           - List or range of years to render
+      map_file_format - Output file name with a {} placeholder for the year
+      processes       - Number of worker processes, None for one per CPU
+                        or 1 to render in this process
+
+    Output:
+      Returns the list of map files written, in the order of years.
+
+    Action:
+      Computes the GDP mappings of all years in one pass and renders one
+      world map per year, in parallel across a process pool.  If a
+      render cache is set, maps identical to earlier ones are copied
+      from it and only the others are rendered.
+    """
+    map_dicts = build_map_dicts_by_code(gdpinfo, codeinfo, plot_countries, years)
+    years = list(map_dicts)
+    map_files = [map_file_format.format(year) for year in years]
+    map_data = [map_dicts[year] for year in years]
+    pending = range(len(years))
+    cache = _RENDER_CACHE
+    if cache is not None:
+        keys = [map_render_key(data, year) for data, year in zip(map_data, years)]
+        pending = [index for index in pending if not cache.fetch(keys[index], map_files[index])]
+    args = ([map_data[index] for index in pending], [years[index] for index in pending],
+            [map_files[index] for index in pending])
+    if processes == 1:
+        list(map(render_map_svg, *args))
+    elif pending:
+        from concurrent.futures import ProcessPoolExecutor
+
+        with ProcessPoolExecutor(max_workers=processes) as executor:
+            list(executor.map(render_map_svg, *args))
+    if cache is not None:
+        for index in pending:
+            cache.store(keys[index], map_files[index])
+    return map_files
+
+
+def test_render_world_map():
+    """
+    Test the project code for several years
+    """
+    gdpinfo = {
+        "gdpfile": "isp_gdp.csv",
+        "separator": ",",
+        "quote": '"',
+        "min_year": 1960,
+        "max_year": 2015,
+        "country_name": "Country Name",
+        "country_code": "Country Code"
+    }
+
+    codeinfo = {
+        "codefile": "isp_country_codes.csv",
+        "separator": ",",
+        "quote": '"',
+        "plot_codes": "ISO3166-1-Alpha-2",
+        "data_codes": "ISO3166-1-Alpha-3"
+    }
+
+    import pygal
 
-# def render_world_map(gdpinfo, codeinfo, plot_countries, year, map_file):
-#     """
-#     Inputs:
-#       gdpinfo        - A GDP information dictionary
-#       codeinfo       - A country code information dictionary
-#       plot_countries - Dictionary mapping plot library country codes to country names
-#       year           - String year of data
-#       map_file       - String that is the output map file name
-#
-#     Output:
-#       Returns None.
-#
-#     Action:
-#       Creates a world map plot of the GDP data in gdp_mapping and outputs
-#       it to a file named by svg_filename.
-#     """
-#     return
-
-
-# def test_render_world_map():
-#     """
-#     Test the project code for several years
-#     """
-#     gdpinfo = {
-#         "gdpfile": "isp_gdp.csv",
-#         "separator": ",",
-#         "quote": '"',
-#         "min_year": 1960,
-#         "max_year": 2015,
-#         "country_name": "Country Name",
-#         "country_code": "Country Code"
-#     }
-#
-#     codeinfo = {
-#         "codefile": "isp_country_codes.csv",
-#         "separator": ",",
-#         "quote": '"',
-#         "plot_codes": "ISO3166-1-Alpha-2",
-#         "data_codes": "ISO3166-1-Alpha-3"
-#     }
-#
-#     # Get pygal country code map
-#     pygal_countries = pygal.maps.world.COUNTRIES
-#
-#     # 1960
-#     render_world_map(gdpinfo, codeinfo, pygal_countries, "1960", "isp_gdp_world_code_1960.svg")
-#
-#     # 1980
-#     render_world_map(gdpinfo, codeinfo, pygal_countries, "1980", "isp_gdp_world_code_1980.svg")
-#
-#     # 2000
-#     render_world_map(gdpinfo, codeinfo, pygal_countries, "2000", "isp_gdp_world_code_2000.svg")
-#
-#     # 2010
-#     render_world_map(gdpinfo, codeinfo, pygal_countries, "2010", "isp_gdp_world_code_2010.svg")
+    # Get pygal country code map
+    pygal_countries = pygal.maps.world.COUNTRIES
+
+    # 1960, 1980, 2000 and 2010
+    render_world_maps(gdpinfo, codeinfo, pygal_countries, [1960, 1980, 2000, 2010],
+                      "isp_gdp_world_code_{}.svg")
+
+
+def write_synthetic_gdp_file(filename, numcountries, min_year=1960, max_year=2015, seed=0):
+    """
+    Inputs:
+      filename     - Name of CSV file to write
+      numcountries - Number of country rows
+      min_year     - First year column
+      max_year     - Last year column
+      seed         - Seed for the random number generator
+
+    Output:
+      Writes a World Bank style GDP file with one row per country and
+      one column per year, leaving about one value in ten empty, and
+      returns the GDP data information dictionary describing it.
+    """
+    rng = random.Random(seed)
+    with open(filename, "w", newline='') as csvfile:
+        writer = csv.writer(csvfile, quoting=csv.QUOTE_ALL)
+        writer.writerow(["Country Name", "Country Code", "Indicator Name", "Indicator Code"] +
+                        [str(year) for year in range(min_year, max_year + 1)])
+        for country in range(numcountries):
+            values = ["" if rng.random() < 0.1 else repr(rng.uniform(1e8, 1e13))
+                      for _ in range(min_year, max_year + 1)]
+            writer.writerow(["Country {}".format(country), "C{:05d}".format(country),
+                             "GDP (current US$)", "NY.GDP.MKTP.CD"] + values)
+    return {
+        "gdpfile": filename,
+        "separator": ",",
+        "quote": '"',
+        "min_year": min_year,
+        "max_year": max_year,
+        "country_name": "Country Name",
+        "country_code": "Country Code"
+    }
+
+
+def benchmark_build_map_dicts(numcountries=2000, min_year=1960, max_year=2015, repeat=5):
+    """
+    Inputs:
+      numcountries - Number of countries in the synthetic GDP file
+      min_year     - First year column
+      max_year     - Last year column
+      repeat       - Number of timed calls of each kind
+
+    Output:
+      Times build_map_dicts_by_code for every year of a synthetic GDP
+      file with the per-country path, with a GdpMatrix whose columns
+      are not parsed yet and with one whose columns are, and prints and
+      returns a dictionary mapping "per-country", "matrix cold" and
+      "matrix warm" to the best time of each in seconds.  Returns None
+      if NumPy is not installed.
+    """
+    global np
+    numpy_module = load_numpy()
+    if numpy_module is None:
+        print("NumPy is not installed")
+        return None
+
+    timings = {"per-country": [], "matrix cold": [], "matrix warm": []}
+    with tempfile.TemporaryDirectory() as directory:
+        gdpinfo = write_synthetic_gdp_file(os.path.join(directory, "gdp.csv"), numcountries,
+                                           min_year, max_year)
+        codeinfo = {"codefile": os.path.join(directory, "codes.csv"), "separator": ",",
+                    "quote": '"', "plot_codes": "Plot", "data_codes": "Data"}
+        with open(codeinfo["codefile"], "w", newline='') as csvfile:
+            writer = csv.writer(csvfile)
+            writer.writerow(["Plot", "Data"])
+            for country in range(numcountries):
+                writer.writerow(["c{}".format(country), "C{:05d}".format(country)])
+        plot_countries = {"c{}".format(country): "c{}".format(country)
+                          for country in range(numcountries)}
+        years = range(min_year, max_year + 1)
+        matrix = load_gdp_matrix(gdpinfo)
+        try:
+            for _ in range(repeat):
+                for kind, times in timings.items():
+                    np = None if kind == "per-country" else numpy_module
+                    if kind == "matrix cold":
+                        matrix._cells = None
+                        matrix._columns = {}
+                    start = time.perf_counter()
+                    build_map_dicts_by_code(gdpinfo, codeinfo, plot_countries, years)
+                    times.append(time.perf_counter() - start)
+        finally:
+            np = numpy_module
+    for key in [key for key in _FILE_CACHE if key[1].startswith(directory)]:
+        del _FILE_CACHE[key]
+
+    results = {kind: min(times) for kind, times in timings.items()}
+    print("{} countries x {} years: per-country {:.3f} s, matrix cold {:.3f} s, "
+          "matrix warm {:.3f} s".format(numcountries, len(years), results["per-country"],
+                                        results["matrix cold"], results["matrix warm"]))
+    return results
+
+
+def benchmark_import_time():
+    """
+    Output:
+      Imports this module in a fresh interpreter with -X importtime and
+      prints and returns a tuple of the cumulative import time of the
+      module in microseconds, whether pygal was imported with it, the
+      number of characters written to stdout and the list of data files
+      opened while importing it.
+
+    Action:
+      Raises AssertionError if importing the module opens a data file
+      or writes to stdout.
+    """
+    directory = os.path.dirname(os.path.abspath(__file__))
+    module = os.path.splitext(os.path.basename(__file__))[0]
+    probe = "\n".join([
+        "import contextlib, io, os, sys",
+        "opened = []",
+        "def audit(event, args):",
+        "    if (event == 'open' and isinstance(args[0], str)",
+        "            and not args[0].endswith(('.py', '.pyc'))):",
+        "        opened.append(os.path.basename(args[0]))",
+        "sys.addaudithook(audit)",
+        "output = io.StringIO()",
+        "with contextlib.redirect_stdout(output):",
+        "    import {}".format(module),
+        "print('pygal' in sys.modules, len(output.getvalue()), *opened, sep='\\t')",
+    ])
+    completed = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", probe],
+        cwd=directory, capture_output=True, text=True, check=True)
+    cumulative = None
+    for line in completed.stderr.splitlines():
+        fields = line.split("|")
+        if len(fields) == 3 and fields[2].strip() == module:
+            cumulative = int(fields[1])
+    report = completed.stdout.rstrip("\n").split("\t")
+    pygal_imported = report[0] == "True"
+    printed = int(report[1])
+    opened = report[2:]
+    print("import {}: {} us cumulative, pygal imported: {}, "
+          "{} characters printed, files opened: {}".format(
+              module, cumulative, pygal_imported, printed, opened))
+    assert not opened and not printed, "importing {} has side effects".format(module)
+    return cumulative, pygal_imported, printed, opened
+
+
+def demo_build_map_dict_by_code():
+    """
+    Prints the results of build_map_dict_by_code for two of the small
+    sample tables.
+    """
+    print(
+        build_map_dict_by_code({'gdpfile': 'gdptable3.csv', 'separator': ';', 'quote': "'", 'min_year': 20010, 'max_year': 20017, 'country_name': 'ID', 'country_code': 'CC'}, {'codefile': 'code1.csv', 'separator': ',', 'quote': "'", 'plot_codes': 'Code4', 'data_codes': 'Code3'}, {'C1': 'c1', 'C2': 'c2', 'C3': 'c3', 'C4': 'c4', 'C5': 'c5'}, '20012')
+        , build_map_dict_by_code({'gdpfile': 'gdptable2.csv', 'separator': ',', 'quote': '"', 'min_year': 1953, 'max_year': 1958, 'country_name': 'Country Name', 'country_code': 'Code'}, {'codefile': 'code2.csv', 'separator': ',', 'quote': "'", 'plot_codes': 'Cd2', 'data_codes': 'Cd1'}, {'C1': 'c1', 'C2': 'c2', 'C3': 'c3', 'C4': 'c4', 'C5': 'c5'}, '1953')
+    )
 
 
 # Make sure the following call to test_render_world_map is commented
@@ -233,7 +983,12 @@ def build_map_dict_by_code(gdpinfo, codeinfo, plot_countries, year):
 
 # test_render_world_map()
 
-print(
-    build_map_dict_by_code({'gdpfile': 'gdptable3.csv', 'separator': ';', 'quote': "'", 'min_year': 20010, 'max_year': 20017, 'country_name': 'ID', 'country_code': 'CC'}, {'codefile': 'code1.csv', 'separator': ',', 'quote': "'", 'plot_codes': 'Code4', 'data_codes': 'Code3'}, {'C1': 'c1', 'C2': 'c2', 'C3': 'c3', 'C4': 'c4', 'C5': 'c5'}, '20012')
-    , build_map_dict_by_code({'gdpfile': 'gdptable2.csv', 'separator': ',', 'quote': '"', 'min_year': 1953, 'max_year': 1958, 'country_name': 'Country Name', 'country_code': 'Code'}, {'codefile': 'code2.csv', 'separator': ',', 'quote': "'", 'plot_codes': 'Cd2', 'data_codes': 'Cd1'}, {'C1': 'c1', 'C2': 'c2', 'C3': 'c3', 'C4': 'c4', 'C5': 'c5'}, '1953')
-)
+# Uncomment to run the benchmarks.
+
+# benchmark_build_map_dicts()
+# benchmark_import_time()
+
+# Run the demo when this file is executed as a script.
+
+if __name__ == "__main__":
+    demo_build_map_dict_by_code()
@@ -1,4 +1,13 @@
 import csv
+import os
+import tempfile
+import time
+from collections import namedtuple
+from collections.abc import Mapping
+from operator import itemgetter
+
+# Size in bytes of the buffer used when writing CSV files
+WRITE_BUFFER_SIZE = 1 << 20
 
 def read_csv_fieldnames(filename, separator, quote):
     """
@@ -55,11 +64,137 @@ def read_csv_as_nested_dict(filename, keyfield, separator, quote):
             nested_dict[row[keyfield]] = row
         return nested_dict
 
+
+class CsvRow(Mapping):
+    """
+    Read-only row of a CSV file that shares one field name to position
+    mapping with every other row of the same file and stores only a
+    tuple of its own values.  Supports row[field], field in row, get,
+    keys, items and comparison with dictionaries.
+    """
+
+    __slots__ = ("_schema", "_values")
+
+    def __init__(self, schema, values):
+        """
+        Inputs:
+          schema - Dictionary mapping field names to positions in values
+          values - Tuple of field values
+        """
+        self._schema = schema
+        self._values = values
+
+    def __getitem__(self, field):
+        return self._values[self._schema[field]]
+
+    def __contains__(self, field):
+        return field in self._schema
+
+    def __iter__(self):
+        return iter(self._schema)
+
+    def __len__(self):
+        return len(self._schema)
+
+    def __repr__(self):
+        return "CsvRow({!r})".format(dict(self))
+
+
+def read_csv_as_compact_nested_dict(filename, keyfield, separator, quote):
+    """
+    Inputs:
+      filename  - name of CSV file
+      keyfield  - field to use as key for rows
+      separator - character that separates fields
+      quote     - character used to optionally quote fields
+    Output:
+      Returns the same dictionary as read_csv_as_nested_dict, except
+      that the rows are CsvRow objects sharing a single field mapping
+      instead of one dictionary per row.  As with csv.DictReader, missing
+      trailing values are None and values beyond the header are listed
+      under the key None.
+    """
+    table = {}
+    with open(filename, newline='', encoding='utf-8') as csvfile:
+        csvreader = csv.reader(csvfile, delimiter=separator, quotechar=quote)
+        header = next(csvreader, [])
+        schema = {field: position for position, field in enumerate(header)}
+        width = len(header)
+        extra_schema = dict(schema)
+        extra_schema[None] = width
+        padding = (None,) * width
+        keyposition = schema[keyfield]
+        for row in csvreader:
+            if not row:
+                continue
+            if len(row) > width:
+                table[row[keyposition]] = CsvRow(extra_schema, tuple(row[:width]) + (row[width:],))
+                continue
+            values = tuple(row)
+            if len(values) < width:
+                values += padding[len(values):]
+            table[values[keyposition]] = CsvRow(schema, values)
+    return table
+
+
+def read_csv_as_dict_stream(filename, separator, quote, fields=None):
+    """
+    Inputs:
+      filename  - name of CSV file
+      separator - character that separates fields
+      quote     - character used to optionally quote fields
+      fields    - list of field names to keep, or None to keep all
+    Output:
+      Returns a generator that yields one dictionary per row of the CSV
+      file, reading the file lazily.  The dictionaries map the field
+      names (only those in fields, if given) to the field values for
+      that row.
+    """
+    with open(filename, newline='', encoding='utf-8') as csvfile:
+        if fields is None:
+            yield from csv.DictReader(csvfile, delimiter=separator, quotechar=quote)
+            return
+        csvreader = csv.reader(csvfile, delimiter=separator, quotechar=quote)
+        header = next(csvreader, [])
+        positions = [(field, header.index(field)) for field in fields]
+        for row in csvreader:
+            if row:
+                yield {field: row[position] if position < len(row) else None
+                       for field, position in positions}
+
+
+def read_csv_as_tuple_stream(filename, separator, quote, fields=None, named=False):
+    """
+    Inputs:
+      filename  - name of CSV file
+      separator - character that separates fields
+      quote     - character used to optionally quote fields
+      fields    - list of field names to keep, or None to keep all
+      named     - if True, yield namedtuples instead of plain tuples
+    Output:
+      Returns a generator that yields one tuple per row of the CSV
+      file, reading the file lazily.  Each tuple holds the values of
+      fields (or of every field) in that order.  Field names that are
+      not valid identifiers are renamed positionally in namedtuples.
+    """
+    with open(filename, newline='', encoding='utf-8') as csvfile:
+        csvreader = csv.reader(csvfile, delimiter=separator, quotechar=quote)
+        header = next(csvreader, [])
+        fields = header if fields is None else fields
+        positions = [header.index(field) for field in fields]
+        row_type = namedtuple("Row", fields, rename=True)._make if named else tuple
+        for row in csvreader:
+            if row:
+                yield row_type(row[position] if position < len(row) else None
+                               for position in positions)
+
+
 def write_csv_from_list_dict(filename, table, fieldnames, separator, quote):
     """
     Inputs:
       filename   - name of CSV file
-      table      - list of dictionaries containing the table to write
+      table      - list of dictionaries containing the table to write, or
+                   any iterable of them such as a generator
       fieldnames - list of strings corresponding to the field names in order
       separator  - character that separates fields
       quote      - character used to optionally quote fields
@@ -68,9 +203,104 @@ def write_csv_from_list_dict(filename, table, fieldnames, separator, quote):
       given fieldnames.  The CSV file should use the given separator and
       quote characters.  All non-numeric fields will be quoted.
     """
-    with open(filename, 'w', newline='',encoding='utf-8') as csvfile:
+    write_csv_from_tuples(filename, dicts_as_tuples(table, fieldnames), fieldnames, separator, quote)
+
+
+def dicts_as_tuples(table, fieldnames):
+    """
+    Inputs:
+      table      - iterable of dictionaries
+      fieldnames - list of strings corresponding to the field names in order
+    Output:
+      Returns a generator of tuples holding the values of fieldnames in
+      each dictionary, with "" for missing fields, as csv.DictWriter
+      orders them.  Raises ValueError for a dictionary with fields not in
+      fieldnames, as csv.DictWriter does.
+    """
+    fieldset = set(fieldnames)
+    getter = itemgetter(*fieldnames) if fieldnames else None
+    single = len(fieldnames) == 1
+    for row in table:
+        if getter is not None and len(row) == len(fieldset) and fieldset.issuperset(row):
+            # Every field is present, so the values can be fetched at once
+            values = getter(row)
+            yield (values,) if single else values
+            continue
+        wrong_fields = row.keys() - fieldset
+        if wrong_fields:
+            raise ValueError("dict contains fields not in fieldnames: "
+                             + ", ".join([repr(field) for field in wrong_fields]))
+        yield tuple(row.get(field, "") for field in fieldnames)
+
+
+def write_csv_from_tuples(filename, rows, fieldnames, separator, quote):
+    """
+    Inputs:
+      filename   - name of CSV file
+      rows       - iterable of tuples (or lists) of field values, in the
+                   order of fieldnames; may be a generator
+      fieldnames - list of strings corresponding to the field names in order
+      separator  - character that separates fields
+      quote      - character used to optionally quote fields
+    Output:
+      Writes the rows to a CSV file with the name filename, producing
+      the same bytes as write_csv_from_list_dict for the corresponding
+      dictionaries but without building or looking up dictionaries.
+    """
+    with open(filename, 'w', newline='', encoding='utf-8', buffering=WRITE_BUFFER_SIZE) as csvfile:
+        writer = csv.writer(csvfile, delimiter=separator, quotechar=quote,
+                            quoting=csv.QUOTE_NONNUMERIC)
+        writer.writerow(fieldnames)
+        writer.writerows(rows)
+
+
+def write_csv_from_list_dict_rowwise(filename, table, fieldnames, separator, quote):
+    """
+    Previous implementation of write_csv_from_list_dict, writing one row
+    per call with the default buffer.  Kept as the benchmark baseline.
+    """
+    with open(filename, 'w', newline='', encoding='utf-8') as csvfile:
         writer = csv.DictWriter(csvfile, fieldnames=fieldnames, delimiter=separator, quotechar=quote,
                                 quoting=csv.QUOTE_NONNUMERIC)
         writer.writeheader()
         for row in table:
-            writer.writerow(row)
\ No newline at end of file
+            writer.writerow(row)
+
+
+def benchmark_write_csv(numrows=200000):
+    """
+    Inputs:
+      numrows - number of rows to write
+    Output:
+      Writes the same synthetic table with each writer, checks that the
+      files are byte-identical, and prints and returns a dictionary
+      mapping each writer to a tuple of rows/s and MB/s.
+    """
+    fieldnames = ["name", "code", "year", "value", "note"]
+    table = [{"name": "Country {}".format(index), "code": "C{:05d}".format(index % 50000),
+              "year": 1960 + index % 56, "value": index * 1.5, "note": 'say "hi", ok'}
+             for index in range(numrows)]
+    rows = [tuple(row[field] for field in fieldnames) for row in table]
+
+    writers = [("rowwise dicts", write_csv_from_list_dict_rowwise, table),
+               ("bulk dicts", write_csv_from_list_dict, table),
+               ("bulk tuples", write_csv_from_tuples, rows)]
+    results = {}
+    contents = set()
+    with tempfile.TemporaryDirectory() as directory:
+        filename = os.path.join(directory, "table.csv")
+        for name, writer, data in writers:
+            start = time.perf_counter()
+            writer(filename, data, fieldnames, ',', '"')
+            elapsed = time.perf_counter() - start
+            with open(filename, 'rb') as csvfile:
+                content = csvfile.read()
+            contents.add(content)
+            results[name] = (numrows / elapsed, len(content) / elapsed / 1e6)
+    assert len(contents) == 1, "writers produced different output"
+
+    for name, (rows_per_second, megabytes_per_second) in results.items():
+        print("{}: {:.0f} rows/s, {:.1f} MB/s".format(name, rows_per_second, megabytes_per_second))
+    return results
+
+# benchmark_write_csv()